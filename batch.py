@@ -0,0 +1,230 @@
+"""Headless batch mode: audit a list of domains and stream results to CSV or JSONL.
+
+    python main.py domains.csv -o results.jsonl --workers 4
+
+Finished domains are recorded in a checkpoint file next to the output, so an
+interrupted run picks up where it stopped when started again with the same output.
+Domains whose audit failed go to <output>.errors.jsonl instead and are retried on
+the next run.
+Stage timings, tokens, cost and cache hit rates for the run are written to
+<output>.metrics.json, and optionally in Prometheus text format with --prometheus.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+import fetcher
+import llm
+import metrics
+from main import analyze_domain
+
+RESULT_FIELDS = ["domain", "email", "issues", "error", "seconds"]
+
+
+def read_domains(path):
+    # Accepts a CSV with a "domain" column, or one domain per line
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row for row in csv.reader(f) if row and row[0].strip()]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = 0
+    if "domain" in header:
+        column = header.index("domain")
+        rows = rows[1:]
+    domains = (row[column].strip() for row in rows if len(row) > column)
+    return list(dict.fromkeys(d.replace("https://", "").replace("http://", "").strip("/") for d in domains if d))
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_written(path):
+    # Domains already in a results file; covers a crash between writing a result and checkpointing it
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl") or path.endswith(".json"):
+            domains = set()
+            for line in f:
+                try:
+                    domains.add(json.loads(line)["domain"])
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short by the crash; that domain is audited again
+                    continue
+            return domains
+        return {row["domain"] for row in csv.DictReader(f) if row.get("domain")}
+
+
+class ResultWriter:
+    """Appends one result per finished domain and flushes it straight to disk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = path.endswith(".jsonl") or path.endswith(".json")
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+            if new_file:
+                self._csv.writeheader()
+
+    def write(self, result):
+        if self.jsonl:
+            self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        else:
+            self._csv.writerow({**result, "issues": json.dumps(result["issues"], ensure_ascii=False)})
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def init_worker(llm_concurrency, requests_per_minute, tokens_per_minute, max_connections, profile_dir=""):
+    # Each worker process gets its share of the global budget
+    logging.getLogger().setLevel(logging.WARNING)
+    metrics.PROFILE_DIR = profile_dir
+    llm.LLM_CONCURRENCY = llm_concurrency
+    llm._default_limiter = llm.RateLimiter(requests_per_minute, tokens_per_minute)
+    fetcher._default_fetcher = fetcher.SyncFetcher(
+        max_connections=max_connections,
+        max_per_host=min(max_connections, fetcher.MAX_CONNECTIONS_PER_HOST),
+    )
+
+
+def audit_domain(domain, api_key, options):
+    # Returns (result row, metrics report)
+    registry = metrics.Metrics()
+    start = time.perf_counter()
+    try:
+        email, issues = analyze_domain(domain, api_key, metrics_registry=registry, **options)
+        error = ""
+    except Exception as e:
+        email, issues, error = "", [], repr(e)
+    result = {"domain": domain, "email": email, "issues": issues, "error": error,
+              "seconds": round(time.perf_counter() - start, 2)}
+    return result, registry.report()
+
+
+def run_batch(domains, output, api_key, workers=4, llm_concurrency=8, requests_per_minute=llm.REQUESTS_PER_MINUTE,
+              tokens_per_minute=llm.TOKENS_PER_MINUTE, max_connections=64, checkpoint=None, metrics_report=None,
+              prometheus=None, profile_dir="", **options):
+    checkpoint = checkpoint or output + ".checkpoint"
+    metrics_report = metrics_report or output + ".metrics.json"
+    done = load_checkpoint(checkpoint) | load_written(output)
+    pending = [d for d in domains if d not in done]
+    logging.info(f"{len(domains)} domains, {len(done & set(domains))} already done, {len(pending)} to audit")
+    if not pending:
+        return
+    workers = max(1, min(workers, len(pending)))
+    initargs = (
+        max(1, llm_concurrency // workers),
+        max(1, requests_per_minute // workers),
+        max(1, tokens_per_minute // workers),
+        max(1, max_connections // workers),
+        profile_dir,
+    )
+    writer = ResultWriter(output)
+    errors = ResultWriter(output + ".errors.jsonl")
+    run_metrics = metrics.Metrics()
+    started = time.perf_counter()
+    finished = failed = 0
+    try:
+        with open(checkpoint, "a", encoding="utf-8") as checkpoint_file, \
+                ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(audit_domain, domain, api_key, options) for domain in pending]
+            for future in as_completed(futures):
+                result, report = future.result()
+                run_metrics.merge(report)
+                finished += 1
+                if result["error"]:
+                    # Failed domains stay out of the results and the checkpoint so a restart retries them
+                    failed += 1
+                    errors.write(result)
+                    logging.warning(f"Audit failed for {result['domain']}: {result['error']}")
+                else:
+                    writer.write(result)
+                    checkpoint_file.write(result["domain"] + "\n")
+                    checkpoint_file.flush()
+                elapsed = time.perf_counter() - started
+                logging.info(f"[{finished}/{len(pending)}] {result['domain']}: {len(result['issues'])} issues "
+                             f"in {result['seconds']}s ({finished / elapsed * 3600:.0f} domains/hour)")
+    finally:
+        writer.close()
+        errors.close()
+        elapsed = time.perf_counter() - started
+        run_metrics.write_report(metrics_report, domains=finished, failed=failed, seconds=round(elapsed, 2))
+        if prometheus:
+            run_metrics.write_prometheus(prometheus)
+    logging.info(f"Audited {finished} domains ({failed} failed) in {elapsed:.1f}s: "
+                 f"{finished / elapsed * 3600:.0f} domains/hour")
+    logging.info(f"Stage timings: {run_metrics.summary()}")
+    logging.info(f"Wrote run metrics to {metrics_report}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit a list of domains and write one result per domain.")
+    parser.add_argument("domains", help="CSV with a 'domain' column, or a text file with one domain per line")
+    parser.add_argument("-o", "--output", required=True, help="results file (.csv or .jsonl)")
+    parser.add_argument("--checkpoint", help="finished-domain log (default: <output>.checkpoint)")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="chat completions in flight across all workers")
+    parser.add_argument("--rpm", type=int, default=llm.REQUESTS_PER_MINUTE, help="OpenAI requests/minute across all workers")
+    parser.add_argument("--tpm", type=int, default=llm.TOKENS_PER_MINUTE, help="OpenAI tokens/minute across all workers")
+    parser.add_argument("--max-connections", type=int, default=64, help="HTTP connections across all workers")
+    parser.add_argument("--metrics", help="run metrics report (default: <output>.metrics.json)")
+    parser.add_argument("--prometheus", help="also write run metrics in Prometheus text format to this file")
+    parser.add_argument("--profile-dir", default="", help="dump cProfile stats for each audited domain into this directory")
+    parser.add_argument("--languages", help="comma-separated language codes to analyze, e.g. en,fr,de")
+    parser.add_argument("--prompt-file", help="file with the prompt template (must contain {text})")
+    parser.add_argument("--robots-enlargement", action="store_true", help="also crawl domains referenced in robots.txt")
+    parser.add_argument("--sitemap", action="store_true", help="discover pages from the site's sitemaps")
+    parser.add_argument("--incremental", action="store_true", help="reuse findings for pages unchanged since the last audit")
+    parser.add_argument("--prescreen", action="store_true",
+                        help="send only sentences with local error signals to the LLM instead of whole pages (experimental)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("OPENAI_API_KEY is not set")
+    prompt_template = None
+    if args.prompt_file:
+        with open(args.prompt_file, encoding="utf-8") as f:
+            prompt_template = f.read()
+
+    run_batch(
+        read_domains(args.domains),
+        args.output,
+        api_key,
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        max_connections=args.max_connections,
+        checkpoint=args.checkpoint,
+        metrics_report=args.metrics,
+        prometheus=args.prometheus,
+        profile_dir=args.profile_dir,
+        prompt_template=prompt_template,
+        allowed_languages=args.languages.split(",") if args.languages else None,
+        use_robots_enlargement=args.robots_enlargement,
+        use_sitemap=args.sitemap,
+        incremental=args.incremental,
+        prescreen=args.prescreen,
+    )
+
+
+if __name__ == "__main__":
+    main()
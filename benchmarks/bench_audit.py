@@ -0,0 +1,201 @@
+"""Time analyze_domain end to end and per stage against a synthetic site and a mock OpenAI server.
+
+Run from the repository root: python -m benchmarks.bench_audit [--scenarios crawl sitemap ...]
+
+Each run is appended to benchmarks/results.jsonl with the commit it ran on and
+compared with the previous run of the same scenario and configuration; stages
+that got slower than --threshold are reported, and --fail-on-regression makes
+them fail the command. Scenarios whose site sets a robots.txt Crawl-delay fail the
+command whenever two requests reached the site closer together than that delay.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+from benchmarks.mock_openai import start_mock_openai
+from benchmarks.synthetic_site import SiteConfig, start_site
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.jsonl")
+# Stage changes below this many seconds are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+# Share of the crawl delay two requests must be apart, leaving room for server-side scheduling jitter
+CRAWL_DELAY_TOLERANCE = 0.75
+
+SCENARIOS = {
+    # Plain crawl from the root page, every language reviewed
+    "crawl": {"site": {}, "mock": {}, "audit": {}},
+    # Sitemap discovery restricted to two languages
+    "sitemap": {"site": {}, "mock": {}, "audit": {"use_sitemap": True, "allowed_languages": ["en", "fr"]}},
+    # Slow and failing pages plus frequent 429s
+    "flaky": {"site": {"slow_ratio": 0.15, "error_ratio": 0.1}, "mock": {"rate_limit_ratio": 0.3}, "audit": {}},
+    # Second audit of an unchanged site with incremental state
+    "incremental": {"site": {}, "mock": {}, "audit": {"incremental": True}, "warmup": True},
+    # Seeded errors on 30% of pages, reported by the mock whenever the prompt contains them:
+    # whole pages against pre-screened sentences, compared on prompt tokens per issue found
+    "defects": {"site": {"defect_ratio": 0.3}, "mock": {}, "audit": {}, "find_defects": True},
+    "defects_prescreen": {"site": {"defect_ratio": 0.3}, "mock": {}, "audit": {"prescreen": True}, "find_defects": True},
+    # robots.txt Crawl-delay, checked against the gaps between requests the site saw
+    "polite": {"site": {"crawl_delay": 0.1}, "mock": {}, "audit": {"use_sitemap": True}},
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def reset_caches():
+    # Every measured run starts cold, as a new process would
+    import language
+    import llm_cache
+    import metrics
+    import page_cache
+
+    page_cache._default_cache = page_cache.PageCache()
+    llm_cache._default_cache = None
+    language._memo.clear()
+    metrics.get_metrics().reset()
+
+
+def run_scenario(name, scenario, args):
+    import llm
+    import main as crawler
+    import metrics
+
+    site_config = SiteConfig(pages_per_section=args.pages_per_section, **scenario["site"])
+    mock_options = {"latency": args.llm_latency, "rate_limit_ratio": 0.0, "issue_ratio": 0.3, **scenario["mock"]}
+    site, site_url = start_site(site_config)
+    find_issues = site.site.find_defects if scenario.get("find_defects") else None
+    mock, mock_url, stats = start_mock_openai(**mock_options, find_issues=find_issues)
+    os.environ["OPENAI_BASE_URL"] = mock_url
+    llm._clients.clear()
+    try:
+        random.seed(0)
+        reset_caches()
+        llm._default_limiter = llm.RateLimiter(args.rpm, args.tpm)
+        if scenario.get("warmup"):
+            crawler.analyze_domain(site_url, "sk-mock", **scenario["audit"])
+            reset_caches()
+        before = dict(stats)
+        registry = metrics.Metrics()
+        start = time.perf_counter()
+        _, issues = crawler.analyze_domain(site_url, "sk-mock", metrics_registry=registry, **scenario["audit"])
+        seconds = time.perf_counter() - start
+        report = registry.report()
+        min_gap = site.site.min_request_gap()
+    finally:
+        site.shutdown()
+        mock.shutdown()
+    return {
+        "scenario": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        # Round-tripped so it compares equal to configs read back from the results file
+        "config": json.loads(json.dumps({"site": asdict(site_config), "mock": mock_options, "audit": scenario["audit"],
+                                         "rpm": args.rpm, "tpm": args.tpm})),
+        "seconds": round(seconds, 3),
+        "issues": len(issues),
+        "min_request_gap": round(min_gap, 4) if min_gap is not None else None,
+        "llm": {key: stats[key] - before[key] for key in stats},
+        "stages": {stage: {key: data[key] for key in ("count", "seconds", "p95")}
+                   for stage, data in report["stages"].items()},
+        "counters": {counter["name"] + "".join(f"[{v}]" for v in counter["labels"].values()): counter["value"]
+                     for counter in report["counters"]},
+    }
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(results, result):
+    for earlier in reversed(results):
+        if earlier["scenario"] == result["scenario"] and earlier["config"] == result["config"]:
+            return earlier
+    return None
+
+
+def regressions(previous, result, threshold):
+    # (what, before, after) for every timing or token count that grew by more than threshold
+    found = []
+    pairs = [("total seconds", previous["seconds"], result["seconds"])]
+    pairs += [(f"{stage} seconds", previous["stages"][stage]["seconds"], data["seconds"])
+              for stage, data in result["stages"].items() if stage in previous["stages"]]
+    for what, before, after in pairs:
+        if after > before * (1 + threshold) and after - before > MIN_REGRESSION_SECONDS:
+            found.append((what, before, after))
+    before, after = previous["llm"].get("prompt_tokens", 0), result["llm"].get("prompt_tokens", 0)
+    if before and after > before * (1 + threshold):
+        found.append(("prompt tokens", before, after))
+    return found
+
+
+def print_result(result):
+    llm_stats = result["llm"]
+    per_issue = f"{llm_stats['prompt_tokens'] / result['issues']:.0f}" if result["issues"] else "-"
+    print(f"{result['scenario']:<12} {result['seconds']:7.2f}s  issues={result['issues']}  "
+          f"llm_calls={llm_stats['requests']}  rate_limited={llm_stats['rate_limited']}  "
+          f"prompt_tokens={llm_stats['prompt_tokens']}  tokens/issue={per_issue}")
+    if result["config"]["site"]["crawl_delay"]:
+        print(f"    min gap between requests {result['min_request_gap']}s "
+              f"(crawl delay {result['config']['site']['crawl_delay']}s)")
+    for stage, data in sorted(result["stages"].items(), key=lambda item: -item[1]["seconds"]):
+        print(f"    {stage:<24} {data['count']:5d}x {data['seconds']:8.3f}s  p95 {data['p95']:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS))
+    parser.add_argument("--pages-per-section", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="mock chat completion latency (s)")
+    parser.add_argument("--rpm", type=int, default=5000)
+    parser.add_argument("--tpm", type=int, default=2000000)
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSON lines file the runs are appended to")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    # Caches and crawl state must not leak between runs or into the working tree
+    state_dir = tempfile.mkdtemp(prefix="bench-audit-")
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ["CRAWL_STATE_PATH"] = os.path.join(state_dir, "crawl_state.sqlite3")
+    os.environ.pop("PAGE_CACHE_DIR", None)
+    logging.disable(logging.WARNING)
+
+    history = load_results(args.results)
+    failed = impolite = False
+    for name in args.scenarios:
+        result = run_scenario(name, SCENARIOS[name], args)
+        print_result(result)
+        delay = result["config"]["site"]["crawl_delay"]
+        if delay and result["min_request_gap"] is not None and result["min_request_gap"] < delay * CRAWL_DELAY_TOLERANCE:
+            impolite = True
+            print(f"    CRAWL DELAY NOT HONORED: requests {result['min_request_gap']}s apart, robots.txt asks {delay}s")
+        previous = previous_result(history, result)
+        if previous is not None:
+            for what, before, after in regressions(previous, result, args.threshold):
+                failed = True
+                print(f"    REGRESSION {what}: {before} -> {after} (previous run {previous['commit'] or '?'} "
+                      f"at {previous['timestamp']})")
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+        history.append(result)
+    if impolite or (failed and args.fail_on_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""CPU time and peak memory per page: legacy BeautifulSoup + html2text path vs extract_page.
+
+Run from the repository root against a directory of saved pages:
+
+    python -m benchmarks.bench_extract corpus/
+    python -m benchmarks.bench_extract corpus/ --download urls.txt   # save pages first
+
+Peak memory is what tracemalloc sees, i.e. Python allocations; libxml2's own
+buffers are not counted. The legacy path needs beautifulsoup4 and html2text, which the crawler itself no longer uses.
+"""
+import argparse
+import glob
+import hashlib
+import os
+import statistics
+import time
+import tracemalloc
+
+from extract import extract_page
+
+
+def legacy_extract(html):
+    # What get_page_text and get_all_links used to do: two html.parser passes plus html2text
+    from bs4 import BeautifulSoup
+    import html2text
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "noscript"]):
+        tag.decompose()
+    text = html2text.html2text(soup.get_text(separator=" "))
+    links = [a["href"] for a in BeautifulSoup(html, "html.parser").find_all("a", href=True)]
+    return text, links
+
+
+def download(urls_file, corpus_dir):
+    import requests
+    from fetcher import HEADERS
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    with open(urls_file, encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+    for url in urls:
+        try:
+            response = requests.get(url, headers=HEADERS, timeout=12)
+        except requests.RequestException as e:
+            print(f"skip {url}: {e}")
+            continue
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".html"
+        with open(os.path.join(corpus_dir, name), "w", encoding="utf-8") as f:
+            f.write(response.text)
+
+
+def measure(fn, pages, repeat):
+    cpu, peak = [], []
+    for html in pages:
+        tracemalloc.start()
+        fn(html)
+        peak.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        start = time.process_time()
+        for _ in range(repeat):
+            fn(html)
+        cpu.append((time.process_time() - start) / repeat)
+    return cpu, peak
+
+
+def report(label, cpu, peak):
+    print(f"{label:<10} cpu/page: mean {statistics.mean(cpu) * 1000:7.2f} ms  "
+          f"p95 {sorted(cpu)[int(len(cpu) * 0.95)] * 1000:7.2f} ms   "
+          f"peak mem/page: mean {statistics.mean(peak) / 1024:8.0f} KiB  max {max(peak) / 1024:8.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory of saved .html pages")
+    parser.add_argument("--download", metavar="URLS_FILE", help="fetch these URLs into the corpus first")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.download:
+        download(args.download, args.corpus)
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.corpus, "*.htm*"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append(f.read())
+    if not pages:
+        parser.error(f"no .html files in {args.corpus}")
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB average")
+    report("legacy", *measure(legacy_extract, pages, args.repeat))
+    report("extract", *measure(extract_page, pages, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare the old sequential requests.get loop with the pooled async fetcher.
+
+Run from the repository root: python -m benchmarks.bench_fetch --pages 200 --latency 0.02
+"""
+import argparse
+import time
+
+import requests
+
+from benchmarks.local_site import start_server
+from fetcher import HEADERS, SyncFetcher
+
+
+def sequential(urls):
+    for url in urls:
+        requests.get(url, headers=HEADERS, timeout=12)
+
+
+def pooled(urls, max_connections, max_per_host):
+    fetcher = SyncFetcher(max_connections=max_connections, max_per_host=max_per_host)
+    try:
+        fetcher.fetch_many(urls)
+    finally:
+        fetcher.close()
+
+
+def timed(label, fn, urls):
+    start = time.perf_counter()
+    fn(urls)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(urls):>5} pages  {elapsed:7.2f}s  {len(urls) / elapsed:8.1f} pages/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated server latency per request (s)")
+    parser.add_argument("--max-connections", type=int, default=32)
+    parser.add_argument("--max-per-host", type=int, default=8)
+    args = parser.parse_args()
+
+    server, base_url = start_server(num_pages=args.pages, latency=args.latency)
+    urls = [f"{base_url}/page/{i}" for i in range(args.pages)]
+    try:
+        baseline = timed("sequential requests.get", sequential, urls)
+        fast = timed(f"async pool ({args.max_per_host}/host)", lambda u: pooled(u, args.max_connections, args.max_per_host), urls)
+        print(f"speedup: {baseline / fast:.1f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
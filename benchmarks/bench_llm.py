@@ -0,0 +1,56 @@
+"""Time analyze_domain's LLM review stage against a local site and a mock OpenAI server.
+
+Run from the repository root: python -m benchmarks.bench_llm --concurrency 1 4 8
+"""
+import argparse
+import logging
+import os
+import time
+
+from benchmarks.local_site import start_server
+from benchmarks.mock_openai import start_mock_openai
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5, help="mock chat completion latency (s)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.1, help="share of requests answered with 429")
+    parser.add_argument("--issue-ratio", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rpm", type=int, default=5000)
+    parser.add_argument("--tpm", type=int, default=2000000)
+    args = parser.parse_args()
+
+    site, site_url = start_server(num_pages=args.pages, latency=0.0)
+    mock, mock_url, stats = start_mock_openai(args.latency, args.rate_limit_ratio, args.issue_ratio)
+    os.environ["OPENAI_BASE_URL"] = mock_url
+    # Every level must call the mock; no cached reviews or pages, and nothing written to the working tree
+    os.environ["LLM_CACHE_PATH"] = ""
+    os.environ.pop("PAGE_CACHE_DIR", None)
+    logging.disable(logging.WARNING)
+
+    import llm
+    import main as crawler
+    from benchmarks.bench_audit import reset_caches
+
+    try:
+        for concurrency in args.concurrency:
+            reset_caches()
+            llm.LLM_CONCURRENCY = concurrency
+            llm._default_limiter = llm.RateLimiter(args.rpm, args.tpm)
+            before = dict(stats)
+            start = time.perf_counter()
+            _, issues = crawler.analyze_domain(site_url, "sk-mock")
+            elapsed = time.perf_counter() - start
+            calls = stats["requests"] - before["requests"]
+            limited = stats["rate_limited"] - before["rate_limited"]
+            print(f"concurrency={concurrency:<3} {elapsed:6.2f}s  issues={len(issues)}  "
+                  f"llm_calls={calls}  rate_limited={limited}")
+    finally:
+        site.shutdown()
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_TEMPLATE = """<html><head><title>Page {n}</title></head>
+<body><nav><a href="/">Home</a></nav>
+<header><div>Example Corp - translation and localization services since 1998</div>
+<div>Call us on +33 1 23 45 67 89 or write to hello@example.com</div></header>
+<h1>Page {n}</h1>
+{body}
+{links}
+<footer><p>Example Corp, 12 rue de la Paix, 75002 Paris, France. All rights reserved.</p>
+<p>Privacy policy | Terms of use | Legal notice | Careers | Press</p></footer>
+</body></html>"""
+
+SENTENCES = [
+    "Our team reviews every translation before it goes live.",
+    "We work with native speakers in more than forty languages.",
+    "Each project starts with a short call to understand your audience.",
+    "Glossaries keep product names consistent across markets.",
+    "Deadlines are agreed up front and tracked in a shared dashboard.",
+    "Marketing copy is adapted rather than translated word for word.",
+    "Technical documents are checked by subject-matter experts.",
+    "Quotes are based on word count and the complexity of the content.",
+    "You can upload files directly or connect your content management system.",
+    "Every delivery includes a short quality report.",
+    "Urgent requests can be handled over the weekend.",
+    "We keep translation memories so repeated sentences cost less.",
+]
+
+
+def page_body(n):
+    # Deterministic per-page copy so pages differ while the header and footer repeat
+    rng = random.Random(n)
+    paragraphs = (" ".join(rng.choice(SENTENCES) for _ in range(6)) for _ in range(5))
+    return "\n".join(f"<p>{paragraph} (ref {n}-{i})</p>" for i, paragraph in enumerate(paragraphs))
+
+
+def make_handler(num_pages, latency):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so clients can keep connections alive
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            path = self.path.rstrip("/") or "/"
+            if path == "/":
+                n = 0
+            elif path.startswith("/page/") and path[6:].isdigit() and int(path[6:]) < num_pages:
+                n = int(path[6:])
+            else:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            links = "\n".join(f'<a href="/page/{i}">Page {i}</a>' for i in range(num_pages)) if n == 0 else ""
+            body = PAGE_TEMPLATE.format(n=n, body=page_body(n), links=links).encode("utf-8")
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(num_pages=200, latency=0.02, port=0):
+    # Returns (server, base_url); the server runs in a daemon thread
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(num_pages, latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
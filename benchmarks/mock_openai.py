@@ -0,0 +1,116 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ISSUE_TEMPLATE = (
+    '- Original sentence: "Mock sentence number {n} with an error."\n'
+    "- Issue: Mock grammar issue\n"
+    '- Suggested correction: "Mock sentence number {n} without an error."\n'
+    "- Severity: {severity}"
+)
+# Packed review prompts tag every page excerpt with a "### Section <n>" header
+SECTION_HEADER = re.compile(r"^### Section (\d+)$", re.MULTILINE)
+
+
+FOUND_ISSUE_TEMPLATE = (
+    '- Original sentence: "{sentence}"\n'
+    "- Issue: Seeded error\n"
+    '- Suggested correction: "..."\n'
+    "- Severity: major"
+)
+
+
+def mock_issue(n, minor_ratio):
+    return ISSUE_TEMPLATE.format(n=n, severity="minor" if random.random() < minor_ratio else "major")
+
+
+def found_issues(prompt, find_issues):
+    # Reports the first error find_issues() spots in each section (or in the whole prompt)
+    parts = SECTION_HEADER.split(prompt)
+    if len(parts) == 1:
+        found = find_issues(prompt)
+        return FOUND_ISSUE_TEMPLATE.format(sentence=found[0]) if found else ""
+    issues = []
+    for number, text in zip(parts[1::2], parts[2::2]):
+        found = find_issues(text)
+        if found:
+            issues.append(f"- Section: {number}\n" + FOUND_ISSUE_TEMPLATE.format(sentence=found[0]))
+    return "\n\n".join(issues)
+
+
+def make_handler(latency, rate_limit_ratio, issue_ratio, stats, minor_ratio=0.5, find_issues=None):
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            with lock:
+                stats["requests"] += 1
+            if not self.path.endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            if random.random() < rate_limit_ratio:
+                with lock:
+                    stats["rate_limited"] += 1
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                headers={"retry-after": "0.2"})
+                return
+            time.sleep(latency)
+            prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+            sections = SECTION_HEADER.findall(prompt)
+            if find_issues is not None:
+                content = found_issues(prompt, find_issues)
+            elif sections:
+                content = "\n\n".join(f"- Section: {number}\n" + mock_issue(next(counter), minor_ratio)
+                                       for number in sections if random.random() < issue_ratio)
+            else:
+                content = mock_issue(next(counter), minor_ratio) if random.random() < issue_ratio else ""
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(content) // 4
+            with lock:
+                stats["prompt_tokens"] += prompt_tokens
+                stats["completion_tokens"] += completion_tokens
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_mock_openai(latency=0.5, rate_limit_ratio=0.0, issue_ratio=0.5, port=0, minor_ratio=0.5, find_issues=None):
+    # Returns (server, base_url, stats); point OPENAI_BASE_URL at base_url to use it.
+    # With find_issues(text) -> [sentence], issues are the sentences it finds instead of random ones.
+    stats = {"requests": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    handler = make_handler(latency, rate_limit_ratio, issue_ratio, stats, minor_ratio, find_issues)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1", stats
@@ -0,0 +1,307 @@
+"""Synthetic multilingual website for offline benchmarks.
+
+Every language gets a home page, section indexes and numbered pages linked as a
+binary tree (page n links to 2n+1 and 2n+2), so the link graph is several levels
+deep. Pages carry hreflang alternates, product pages link to near-duplicate print
+versions, to PDFs and to extensionless downloads served as application/pdf, and a
+/private/ area is disallowed in robots.txt. Sitemaps are served as an index
+pointing at one gzipped sitemap per language. A share of pages can be made slow
+or answer 500, chosen deterministically from the path.
+
+With defect_ratio, a share of pages gets one seeded language error: a misspelled
+word, a doubled word or an untranslated sentence. SyntheticSite.defects maps each
+rendered page to its defect sentence so a mock reviewer can report exactly those.
+"""
+import gzip
+import hashlib
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SENTENCES = {
+    "en": [
+        "Our team reviews every translation before it goes live.",
+        "We work with native speakers in more than forty languages.",
+        "Each project starts with a short call to understand your audience.",
+        "Glossaries keep product names consistent across markets.",
+        "Deadlines are agreed up front and tracked in a shared dashboard.",
+        "Marketing copy is adapted rather than translated word for word.",
+        "Technical documents are checked by subject-matter experts.",
+        "Quotes are based on word count and the complexity of the content.",
+    ],
+    "fr": [
+        "Notre équipe relit chaque traduction avant sa mise en ligne.",
+        "Nous travaillons avec des locuteurs natifs dans plus de quarante langues.",
+        "Chaque projet commence par un court appel pour comprendre votre public.",
+        "Les glossaires assurent la cohérence des noms de produits sur tous les marchés.",
+        "Les délais sont fixés à l'avance et suivis dans un tableau de bord partagé.",
+        "Les textes marketing sont adaptés plutôt que traduits mot à mot.",
+        "Les documents techniques sont vérifiés par des experts du domaine.",
+        "Les devis dépendent du nombre de mots et de la complexité du contenu.",
+    ],
+    "de": [
+        "Unser Team prüft jede Übersetzung, bevor sie veröffentlicht wird.",
+        "Wir arbeiten mit Muttersprachlern in mehr als vierzig Sprachen.",
+        "Jedes Projekt beginnt mit einem kurzen Gespräch über Ihre Zielgruppe.",
+        "Glossare halten Produktnamen in allen Märkten einheitlich.",
+        "Termine werden im Voraus vereinbart und in einem gemeinsamen Dashboard verfolgt.",
+        "Marketingtexte werden angepasst statt Wort für Wort übersetzt.",
+        "Technische Dokumente werden von Fachexperten geprüft.",
+        "Angebote richten sich nach der Wortzahl und der Komplexität des Inhalts.",
+    ],
+    "es": [
+        "Nuestro equipo revisa cada traducción antes de publicarla.",
+        "Trabajamos con hablantes nativos en más de cuarenta idiomas.",
+        "Cada proyecto empieza con una breve llamada para conocer a su público.",
+        "Los glosarios mantienen coherentes los nombres de productos en todos los mercados.",
+        "Los plazos se acuerdan de antemano y se siguen en un panel compartido.",
+        "Los textos de marketing se adaptan en lugar de traducirse palabra por palabra.",
+        "Los documentos técnicos los revisan expertos en la materia.",
+        "Los presupuestos dependen del número de palabras y de la complejidad del contenido.",
+    ],
+}
+SECTIONS = ("products", "blog", "support")
+
+PAGE_TEMPLATE = """<html lang="{lang}"><head><title>{title}</title>
+{alternates}
+</head>
+<body><nav><a href="/{lang}/">Home</a> {section_links}</nav>
+<header><div>Example Corp - {tagline}</div></header>
+<h1>{title}</h1>
+{body}
+{links}
+<footer><p>Example Corp, 12 rue de la Paix, 75002 Paris, France.</p>
+<p>Privacy | Terms | Legal | Careers | Press</p></footer>
+</body></html>"""
+
+
+@dataclass
+class SiteConfig:
+    languages: tuple = ("en", "fr", "de")
+    pages_per_section: int = 30
+    # Page bodies are this many paragraphs of six sentences
+    paragraphs: int = 4
+    latency: float = 0.005
+    # Share of pages answering after slow_latency seconds, and share answering 500
+    slow_ratio: float = 0.05
+    slow_latency: float = 0.5
+    error_ratio: float = 0.03
+    # Product pages with a near-duplicate /print version
+    duplicate_ratio: float = 0.5
+    crawl_delay: float = 0.0
+    # Share of pages with one seeded language error
+    defect_ratio: float = 0.0
+
+    @property
+    def num_pages(self):
+        return len(self.languages) * (1 + len(SECTIONS) * (1 + self.pages_per_section))
+
+
+def path_share(path, salt):
+    # Stable pseudo-random number in [0, 1) for a path
+    digest = hashlib.blake2b(f"{salt}:{path}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def page_body(lang, seed, paragraphs, defect=""):
+    rng = random.Random(seed)
+    sentences = SENTENCES[lang]
+    body = [[rng.choice(sentences) for _ in range(6)] for _ in range(paragraphs)]
+    if defect:
+        body[paragraphs // 2][3] = defect
+    return "\n".join(f"<p>{' '.join(paragraph)} ({seed}-{i})</p>" for i, paragraph in enumerate(body))
+
+
+def make_defect(lang, path):
+    # One deterministic error for the page at path: a misspelling, a doubled word or an untranslated sentence
+    rng = random.Random(path)
+    sentence = rng.choice(SENTENCES[lang])
+    words = sentence.split(" ")
+    kind = rng.choice(("typo", "doubled", "untranslated"))
+    if kind == "untranslated":
+        return rng.choice(SENTENCES["fr" if lang == "en" else "en"])
+    if kind == "doubled":
+        i = rng.randrange(1, len(words) - 1)
+        return " ".join(words[:i] + [words[i]] + words[i:])
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    word = words[i]
+    k = rng.choice([j for j in range(1, len(word) - 2) if word[j] != word[j + 1]])
+    words[i] = word[:k] + word[k + 1] + word[k] + word[k + 2:]
+    return " ".join(words)
+
+
+class SyntheticSite:
+    """Renders pages, robots.txt and sitemaps for a SiteConfig."""
+
+    def __init__(self, config, base_url=""):
+        self.config = config
+        self.base_url = base_url
+        # canonical path -> seeded defect sentence, for pages rendered so far
+        self.defects = {}
+        # time.monotonic() at the start of every request after robots.txt, to check the crawl delay
+        self.request_times = []
+
+    def min_request_gap(self):
+        times = sorted(self.request_times)
+        return min((b - a for a, b in zip(times, times[1:])), default=None)
+
+    def find_defects(self, text):
+        return [defect for defect in set(self.defects.values()) if defect in text]
+
+    def robots_txt(self):
+        lines = ["User-agent: *", "Disallow: /private/"]
+        if self.config.crawl_delay:
+            # "1" rather than "1.0": plain robots.txt parsers only accept whole numbers
+            lines.append(f"Crawl-delay: {self.config.crawl_delay:g}")
+        lines.append(f"Sitemap: {self.base_url}/sitemap_index.xml")
+        return "\n".join(lines) + "\n"
+
+    def sitemap_index(self):
+        entries = "".join(f"<sitemap><loc>{self.base_url}/sitemap-{lang}.xml.gz</loc></sitemap>"
+                          for lang in self.config.languages)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>')
+
+    def sitemap(self, lang):
+        urls = []
+        for path in self.page_paths(lang):
+            alternates = "".join(f'<xhtml:link rel="alternate" hreflang="{other}" href="{self.base_url}{self.translate(path, other)}"/>'
+                                 for other in self.config.languages)
+            urls.append(f"<url><loc>{self.base_url}{path}</loc>{alternates}</url>")
+        xml = ('<?xml version="1.0" encoding="UTF-8"?>'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" xmlns:xhtml="http://www.w3.org/1999/xhtml">'
+               + "".join(urls) + "</urlset>")
+        return gzip.compress(xml.encode("utf-8"))
+
+    def page_paths(self, lang):
+        yield f"/{lang}/"
+        for section in SECTIONS:
+            yield f"/{lang}/{section}/"
+            for n in range(self.config.pages_per_section):
+                yield f"/{lang}/{section}/{n}"
+
+    @staticmethod
+    def translate(path, lang):
+        return "/" + lang + path[3:]
+
+    def root_page(self):
+        links = "\n".join(f'<a href="/{lang}/">{lang.upper()}</a>' for lang in self.config.languages)
+        return f'<html lang="en"><head><title>Example Corp</title></head><body><h1>Example Corp</h1>{links}</body></html>'
+
+    def page(self, path):
+        # HTML for a page path, or None when the path does not exist
+        parts = [p for p in path.split("/") if p]
+        if not parts or parts[0] not in self.config.languages:
+            return None
+        lang, rest = parts[0], parts[1:]
+        print_version = bool(rest) and rest[-1] == "print"
+        if print_version:
+            rest = rest[:-1]
+        links = []
+        if not rest:
+            title, seed = "Home", f"{lang}-home"
+            links = [f"/{lang}/{section}/" for section in SECTIONS] + ["/private/admin"]
+        elif len(rest) == 1 and rest[0] in SECTIONS:
+            title, seed = rest[0].title(), f"{lang}-{rest[0]}"
+            links = [f"/{lang}/{rest[0]}/{n}" for n in range(min(2, self.config.pages_per_section))]
+        elif len(rest) == 2 and rest[0] in SECTIONS and rest[1].isdigit() and int(rest[1]) < self.config.pages_per_section:
+            section, n = rest[0], int(rest[1])
+            title, seed = f"{section.title()} {n}", f"{lang}-{section}-{n}"
+            links = [f"/{lang}/{section}/{child}" for child in (2 * n + 1, 2 * n + 2) if child < self.config.pages_per_section]
+            if section == "products":
+                links.append(f"/files/brochure-{n}.pdf")
+                links.append(f"/{lang}/{section}/{n}/download")
+                if path_share(f"/{lang}/{section}/{n}", "duplicate") < self.config.duplicate_ratio:
+                    links.append(f"/{lang}/{section}/{n}/print")
+        else:
+            return None
+        if print_version and not (len(rest) == 2 and rest[0] == "products"):
+            return None
+        canonical = "/" + "/".join([lang] + rest) + ("/" if len(rest) < 2 else "")
+        alternates = "\n".join(f'<link rel="alternate" hreflang="{other}" href="{self.translate(canonical, other)}">'
+                               for other in self.config.languages)
+        defect = ""
+        if path_share(canonical, "defect") < self.config.defect_ratio:
+            defect = self.defects[canonical] = make_defect(lang, canonical)
+        body = page_body(lang, seed, self.config.paragraphs, defect)
+        if print_version:
+            body += "\n<p>Printable version</p>"
+        return PAGE_TEMPLATE.format(
+            lang=lang,
+            title=title,
+            alternates=alternates,
+            section_links=" ".join(f'<a href="/{lang}/{section}/">{section.title()}</a>' for section in SECTIONS),
+            tagline=SENTENCES[lang][0],
+            body=body,
+            links="\n".join(f'<a href="{href}">{href}</a>' for href in links),
+        )
+
+
+def make_handler(site):
+    config = site.config
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+            self.send_response(status)
+            if body:
+                self.send_header("Content-Type", content_type)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path != "/robots.txt":
+                site.request_times.append(time.monotonic())
+            if config.latency:
+                time.sleep(config.latency)
+            if path == "/robots.txt":
+                self._send(200, site.robots_txt().encode("utf-8"), "text/plain")
+                return
+            if path == "/sitemap_index.xml":
+                self._send(200, site.sitemap_index().encode("utf-8"), "application/xml")
+                return
+            if path.startswith("/sitemap-") and path.endswith(".xml.gz") and path[9:-7] in config.languages:
+                self._send(200, site.sitemap(path[9:-7]), "application/gzip")
+                return
+            if path_share(path, "error") < config.error_ratio:
+                self._send(500, b"Internal Server Error", "text/plain")
+                return
+            if path.endswith("/download"):
+                # Only the URL's Content-Type tells the crawler this is not a page
+                self._send(200, b"%PDF-1.4\n" + bytes(256 * 1024), "application/pdf")
+                return
+            if path_share(path, "slow") < config.slow_ratio:
+                time.sleep(config.slow_latency)
+            html = site.root_page() if path == "/" else site.page(path)
+            if html is None:
+                self._send(404)
+                return
+            body = html.encode("utf-8")
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return
+            self._send(200, body, headers={"ETag": etag})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_site(config=None, port=0):
+    # Returns (server, base_url); server.site is the SyntheticSite; the server runs in a daemon thread
+    site = SyntheticSite(config or SiteConfig())
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(site))
+    server.daemon_threads = True
+    server.site = site
+    site.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, site.base_url
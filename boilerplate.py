@@ -0,0 +1,66 @@
+import hashlib
+import re
+
+from llm import estimate_tokens
+
+# A line is template text once it shows up on this many pages and this share of pages seen
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_RATIO = 0.3
+
+DIGITS = re.compile(r"\d+")
+SPACES = re.compile(r"\s+")
+
+
+def line_key(line):
+    # Dates, counters and prices vary between otherwise identical template lines
+    normalized = SPACES.sub(" ", DIGITS.sub("0", line.lower())).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest() if normalized else None
+
+
+class BoilerplateDetector:
+    """Finds header, navigation, cookie and footer lines repeated across one domain's pages.
+
+    Feed every page with add() as it is fetched, then clean() strips the lines
+    seen on enough pages so far. Counts are kept as small line hashes per page.
+    """
+
+    def __init__(self, min_pages=BOILERPLATE_MIN_PAGES, ratio=BOILERPLATE_RATIO):
+        self.min_pages = min_pages
+        self.ratio = ratio
+        self.pages_seen = 0
+        # url -> (tokens before, tokens after) for every cleaned page
+        self.tokens_by_url = {}
+        self._counts = {}
+        self._seen_urls = set()
+
+    def add(self, url, text):
+        if url in self._seen_urls or not text:
+            return
+        self._seen_urls.add(url)
+        self.pages_seen += 1
+        for key in {line_key(line) for line in text.split("\n")}:
+            if key is not None:
+                self._counts[key] = self._counts.get(key, 0) + 1
+
+    def is_boilerplate(self, line):
+        threshold = max(self.min_pages, self.ratio * self.pages_seen)
+        return self._counts.get(line_key(line), 0) >= threshold
+
+    def clean(self, url, text):
+        cleaned = "\n".join(line for line in text.split("\n") if not self.is_boilerplate(line))
+        self.tokens_by_url[url] = (estimate_tokens(text), estimate_tokens(cleaned))
+        return cleaned
+
+    def stats(self):
+        before = sum(b for b, _ in self.tokens_by_url.values())
+        after = sum(a for _, a in self.tokens_by_url.values())
+        return {
+            "pages_seen": self.pages_seen,
+            "pages_cleaned": len(self.tokens_by_url),
+            "tokens_before": before,
+            "tokens_after": after,
+            "tokens_saved": before - after,
+            "saved_ratio": round((before - after) / before, 3) if before else 0.0,
+            "pages": {url: {"tokens_before": b, "tokens_after": a, "tokens_saved": b - a}
+                      for url, (b, a) in self.tokens_by_url.items()},
+        }
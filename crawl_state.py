@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from page_cache import CachedPage
+
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", os.path.join(".cache", "crawl_state.sqlite3"))
+
+
+class CrawlState:
+    """What the last audit of a domain saw, persisted in SQLite for incremental re-audits.
+
+    For every page: validators for conditional GETs, a hash of the extracted text,
+    its language and links, and the LLM finding if the page was reviewed. A page
+    whose content hash changes loses its finding and is reviewed again.
+    """
+
+    def __init__(self, domain, path=CRAWL_STATE_PATH):
+        self.domain = domain
+        self.path = path or ":memory:"
+        # url -> finding reused instead of an LLM call during this run
+        self.carried = {}
+        # url -> True when a previously seen page came back unchanged this run
+        self.unchanged = {}
+        # URLs already recorded this run; later sightings come from the page cache and say nothing new
+        self._recorded = set()
+        if self.path != ":memory:" and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS crawl_pages ("
+            "domain TEXT NOT NULL, url TEXT NOT NULL, etag TEXT, last_modified TEXT, content_hash TEXT, lang TEXT, "
+            "links TEXT, alternates TEXT, issue TEXT, reviewed INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL, "
+            "PRIMARY KEY (domain, url))"
+        )
+        self._conn.commit()
+        self._rows = {row[0]: row for row in self._conn.execute(
+            "SELECT url, etag, last_modified, content_hash, lang, links, alternates, issue, reviewed "
+            "FROM crawl_pages WHERE domain = ?", (domain,))}
+        logging.info(f"Loaded crawl state for {domain}: {len(self._rows)} pages from the previous audit")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def conditional_headers(self, url):
+        # Only for reviewed pages: a 304 yields a page without text, which is fine when its
+        # finding is carried over but would leave a page that was never reviewed unreviewable
+        row = self._rows.get(url)
+        if row is None or not row[8]:
+            return {}
+        return CachedPage(url=url, etag=row[1] or "", last_modified=row[2] or "").conditional_headers()
+
+    def stored_page(self, url):
+        # Page rebuilt from state after a 304; it has links and language but no body or text
+        row = self._rows.get(url)
+        if row is None:
+            return None
+        return CachedPage(url=url, status=200, etag=row[1] or "", last_modified=row[2] or "", content_hash=row[3] or "",
+                          lang=row[4] or "unknown", links=json.loads(row[5] or "[]"), alternates=json.loads(row[6] or "{}"))
+
+    def record_page(self, page):
+        with self._lock:
+            if page.url in self._recorded:
+                return
+            self._recorded.add(page.url)
+            row = self._rows.get(page.url)
+            if not page.ok:
+                # A page that errors or went away loses its finding; links and validators are kept
+                if row is not None and row[8]:
+                    self._write(*row[:7], None, 0)
+                return
+            same = row is not None and row[3] == page.content_hash
+            if row is not None:
+                self.unchanged[page.url] = same
+            issue, reviewed = (row[7], row[8]) if same else (None, 0)
+            if same and (row[1] or "", row[2] or "") == (page.etag, page.last_modified):
+                return
+            self._write(page.url, page.etag, page.last_modified, page.content_hash, page.lang,
+                        json.dumps(page.links), json.dumps(page.alternates), issue, reviewed)
+
+    def previous_issue(self, url):
+        # The finding from the last review if this run fetched the page unchanged since, else None
+        row = self._rows.get(url)
+        if row is None or not row[8] or not self.unchanged.get(url):
+            return None
+        return row[7] or ""
+
+    def record_issue(self, url, issue):
+        with self._lock:
+            row = self._rows.get(url)
+            if row is not None:
+                self._write(*row[:7], issue or "", 1)
+
+    def _write(self, url, *values):
+        self._rows[url] = (url,) + values
+        self._conn.execute(
+            "INSERT OR REPLACE INTO crawl_pages (domain, url, etag, last_modified, content_hash, lang, links, alternates, "
+            "issue, reviewed, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.domain, url) + values + (time.time(),),
+        )
+        self._conn.commit()
+
+    def stats(self):
+        unchanged = sum(self.unchanged.values())
+        return {"known_pages": len(self._rows), "unchanged": unchanged, "changed": len(self.unchanged) - unchanged,
+                "findings_carried": len(self.carried)}
+
+    def close(self):
+        self._conn.close()
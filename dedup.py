@@ -0,0 +1,98 @@
+import hashlib
+import random
+import re
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+MINHASH_PERMUTATIONS = 64
+# 8 bands of 8 rows puts the LSH candidate threshold near 0.77 Jaccard similarity
+LSH_BANDS = 8
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_WORDS = 5
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+DIGITS = re.compile(r"\d+")
+
+
+def shingle_hashes(text, size=SHINGLE_WORDS):
+    words = text.lower().split()
+    if not words:
+        return set()
+    shingles = (" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1)))
+    return {int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles}
+
+
+def minhash(text):
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return None
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """MinHash signatures in LSH buckets; groups pages whose text is nearly the same."""
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD, bands=LSH_BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = MINHASH_PERMUTATIONS // bands
+        # url -> url of the page it duplicates, or None for a distinct page
+        self.duplicate_of = {}
+        self._signatures = {}
+        self._buckets = {}
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, url, text):
+        # Returns the earlier page this one nearly duplicates, or None
+        if url in self.duplicate_of:
+            return self.duplicate_of[url]
+        signature = minhash(text)
+        if signature is None:
+            self.duplicate_of[url] = None
+            return None
+        keys = self._band_keys(signature)
+        candidates = {other for key in keys for other in self._buckets.get(key, ())}
+        best, best_score = None, self.threshold
+        for other in candidates:
+            score = similarity(signature, self._signatures[other])
+            if score >= best_score:
+                best, best_score = other, score
+        self.duplicate_of[url] = best
+        if best is None:
+            # Only distinct pages are indexed; duplicates point at their representative
+            self._signatures[url] = signature
+            for key in keys:
+                self._buckets.setdefault(key, []).append(url)
+        return best
+
+    def groups(self):
+        groups = {}
+        for url, original in self.duplicate_of.items():
+            groups.setdefault(original or url, []).append(url)
+        return groups
+
+
+def url_template(url):
+    # /products/123?color=red and /products/456 share the template /products/0
+    parts = urlsplit(url)
+    return parts.netloc.lower() + DIGITS.sub("0", parts.path.rstrip("/").lower())
+
+
+def order_by_url_diversity(urls):
+    # Round-robin over URL templates so variants of one page come after one page of every kind
+    groups = OrderedDict()
+    for url in urls:
+        groups.setdefault(url_template(url), []).append(url)
+    ordered = []
+    queues = list(groups.values())
+    for depth in range(max((len(q) for q in queues), default=0)):
+        ordered.extend(q[depth] for q in queues if depth < len(q))
+    return ordered
@@ -0,0 +1,102 @@
+import re
+from typing import NamedTuple
+
+from lxml import etree
+from lxml import html as lxml_html
+
+# Elements whose content never counts as page copy
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "object", "head", "nav"}
+# Elements that start a new line in the extracted text
+BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "fieldset", "figcaption",
+    "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol",
+    "p", "pre", "section", "table", "td", "th", "tr", "ul",
+}
+# Whole id/class tokens (or aria-labels, spaces as hyphens) marking cookie and consent banners
+BANNER_PATTERN = re.compile(
+    r"cookies?[-_]?(?:banner|notice|consent|bar|popup|modal|dialog|law-info-bar)|"
+    r"consent(?:[-_]?(?:banner|manager|popup|modal|dialog))?|gdpr(?:[-_]?(?:banner|consent|popup))?|"
+    r"onetrust[-\w]*|cybotcookiebot\w*|cookiebot\w*|didomi[-\w]*|cmplz-cookiebanner|cc[-_](?:banner|window)",
+    re.I,
+)
+# Page containers are never banners, whatever their classes say (e.g. <body class="cookies-not-set">)
+BANNER_EXEMPT_TAGS = {"html", "body", "main"}
+WHITESPACE = re.compile(r"[ \t\r\f\v\u00a0]+")
+
+
+class ExtractedPage(NamedTuple):
+    text: str
+    links: list
+    # Declared language of the document (<html lang>), as written
+    lang: str
+    # href -> hreflang for <link rel="alternate" hreflang> and <a hreflang> entries
+    alternates: dict
+
+
+def is_skipped(el):
+    if el.tag in SKIP_TAGS or el.get("role") == "navigation" or el.get("aria-hidden") == "true":
+        return True
+    if el.tag in BANNER_EXEMPT_TAGS:
+        return False
+    tokens = (el.get("id") or "").split() + (el.get("class") or "").split()
+    label = (el.get("aria-label") or "").strip()
+    if label:
+        tokens.append("-".join(label.split()))
+    return any(BANNER_PATTERN.fullmatch(token) for token in tokens)
+
+
+def parse_html(html):
+    if isinstance(html, str):
+        html = html.encode("utf-8", errors="replace")
+    if not html.strip():
+        return None
+    parser = lxml_html.HTMLParser(encoding="utf-8", remove_comments=True, remove_pis=True)
+    try:
+        return lxml_html.document_fromstring(html, parser=parser)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def extract_page(html):
+    """Parse a document once and return an ExtractedPage.
+
+    Text keeps one line per block element and leaves out scripts, styles,
+    navigation and cookie banners. Hrefs are returned as written in the page,
+    navigation links included.
+    """
+    root = parse_html(html)
+    if root is None:
+        return ExtractedPage("", [], "", {})
+    links = []
+    alternates = {}
+    for a in root.iter("a"):
+        href = (a.get("href") or "").strip()
+        if href:
+            links.append(href)
+            if a.get("hreflang"):
+                alternates[href] = a.get("hreflang")
+    for link in root.iter("link"):
+        href = (link.get("href") or "").strip()
+        if href and link.get("hreflang") and "alternate" in (link.get("rel") or "").lower().split():
+            alternates[href] = link.get("hreflang")
+    lang = root.get("lang") or root.get("xml:lang") or ""
+    parts = []
+    walker = etree.iterwalk(root, events=("start", "end"))
+    for event, el in walker:
+        if not isinstance(el.tag, str):
+            continue
+        if event == "start":
+            if is_skipped(el):
+                walker.skip_subtree()
+                continue
+            if el.tag in BLOCK_TAGS:
+                parts.append("\n")
+            if el.text:
+                parts.append(el.text)
+        else:
+            if el.tag in BLOCK_TAGS:
+                parts.append("\n")
+            if el.tail:
+                parts.append(el.tail)
+    lines = (WHITESPACE.sub(" ", line).strip() for line in "".join(parts).split("\n"))
+    return ExtractedPage("\n".join(line for line in lines if line), links, lang, alternates)
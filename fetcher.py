@@ -0,0 +1,259 @@
+import asyncio
+import atexit
+import codecs
+import logging
+import os
+import re
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import aiohttp
+
+import metrics
+from urlutils import site_host
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+}
+
+# Overall and per-host connection limits; connections are kept alive and reused
+MAX_CONNECTIONS = 32
+MAX_CONNECTIONS_PER_HOST = 8
+REQUEST_TIMEOUT = 12
+# Page bodies are cut off after this many (decompressed) bytes
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+READ_CHUNK_SIZE = 65536
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int = 0
+    content: bytes = b""
+    text: str = ""
+    encoding: str = "utf-8"
+    headers: Mapping = field(default_factory=dict)
+    error: str = ""
+    # Set when the body was not downloaded, e.g. "content type application/pdf"
+    skipped: str = ""
+    # True when the body was cut off at max_body_bytes
+    truncated: bool = False
+
+    @property
+    def ok(self):
+        return self.status == 200
+
+
+def is_html_type(content_type):
+    # A missing Content-Type gets the benefit of the doubt
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return not media_type or media_type in HTML_CONTENT_TYPES
+
+
+def sniff_encoding(head):
+    # Charset from a BOM or <meta> tag in the first bytes of the body, else UTF-8
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = META_CHARSET.search(head[:4096])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except (LookupError, UnicodeDecodeError):
+            pass
+    return "utf-8"
+
+
+class AsyncFetcher:
+    """Asyncio fetcher sharing one keep-alive connection pool across all requests."""
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, max_per_host=MAX_CONNECTIONS_PER_HOST,
+                 timeout=REQUEST_TIMEOUT, headers=None, max_body_bytes=MAX_BODY_BYTES):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.max_body_bytes = max_body_bytes
+        self.headers = dict(headers or HEADERS)
+        # host -> seconds between request starts (robots.txt Crawl-delay), and the next free slot
+        self.crawl_delays = {}
+        self._next_slot = {}
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def fetch(self, url, headers=None, html_only=False):
+        """GET url, streaming the body into memory up to max_body_bytes.
+
+        The body is transfer-decompressed by aiohttp and decoded chunk by chunk.
+        With html_only, a 200 response whose Content-Type is not HTML is dropped
+        before its body is read and comes back with `skipped` set.
+        """
+        session = await self._get_session()
+        try:
+            await self._wait_politely(url)
+            async with session.get(url, headers=headers) as response:
+                content_type = response.headers.get("Content-Type", "")
+                if html_only and response.status == 200 and not is_html_type(content_type):
+                    metrics.count("fetch_skips", reason="content_type")
+                    metrics.count("http_responses", status=response.status)
+                    return FetchResult(url=str(response.url), status=response.status,
+                                       headers=response.headers.copy(), skipped=f"content type {content_type}")
+                encoding = response.charset
+                decoder = None
+                chunks, texts, size, truncated = [], [], 0, False
+                async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                    if decoder is None:
+                        encoding = encoding or sniff_encoding(chunk)
+                        try:
+                            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                        except LookupError:
+                            encoding = "utf-8"
+                            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+                    if size + len(chunk) > self.max_body_bytes:
+                        chunk = chunk[:self.max_body_bytes - size]
+                        truncated = True
+                    chunks.append(chunk)
+                    texts.append(decoder.decode(chunk))
+                    size += len(chunk)
+                    if truncated:
+                        # Leaving the context manager drops the connection instead of draining the rest
+                        metrics.count("fetch_truncated")
+                        logging.warning(f"Truncated {url} at {self.max_body_bytes} bytes")
+                        break
+                if decoder is not None:
+                    texts.append(decoder.decode(b"", final=True))
+                metrics.count("bytes_downloaded", size)
+                metrics.count("http_responses", status=response.status)
+                return FetchResult(
+                    url=str(response.url),
+                    status=response.status,
+                    content=b"".join(chunks),
+                    text="".join(texts),
+                    encoding=encoding or "utf-8",
+                    headers=response.headers.copy(),
+                    truncated=truncated,
+                )
+        except Exception as e:
+            logging.error(f"Error fetching {url}: {e!r}")
+            metrics.count("http_responses", status="error")
+            return FetchResult(url=url, error=repr(e))
+
+    async def _wait_politely(self, url):
+        # Spaces request starts to a host with a crawl delay; runs on the loop thread, so no lock is needed
+        host = site_host(url)
+        delay = self.crawl_delays.get(host)
+        if not delay:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot.get(host, 0.0))
+        self._next_slot[host] = slot + delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def iter_content(self, url, chunk_size=65536):
+        # Streams the (transfer-decoded) body; raises on connection errors and non-200 responses
+        session = await self._get_session()
+        await self._wait_politely(url)
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                  status=response.status, message=response.reason or "")
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+    async def fetch_many(self, urls, headers=None, html_only=False):
+        # headers optionally maps a URL to extra request headers (e.g. conditional GETs)
+        headers = headers or {}
+        return await asyncio.gather(*(self.fetch(url, headers.get(url), html_only) for url in urls))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class SyncFetcher:
+    """Blocking facade over AsyncFetcher for synchronous callers (e.g. Streamlit).
+
+    The event loop runs in a daemon thread for the lifetime of the process so the
+    connection pool survives between calls.
+    """
+
+    def __init__(self, **kwargs):
+        self._fetcher = AsyncFetcher(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fetcher-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch(self, url, headers=None, html_only=False):
+        return self._run(self._fetcher.fetch(url, headers, html_only))
+
+    def set_crawl_delay(self, url, delay):
+        self._loop.call_soon_threadsafe(self._fetcher.crawl_delays.__setitem__, site_host(url), delay)
+
+    def fetch_many(self, urls, headers=None, html_only=False):
+        return self._run(self._fetcher.fetch_many(list(urls), headers, html_only))
+
+    def iter_content(self, url, chunk_size=65536):
+        # Pulls chunks one at a time from the loop thread; closing the iterator aborts the download
+        chunks = self._fetcher.iter_content(url, chunk_size)
+        try:
+            while True:
+                try:
+                    yield self._run(chunks.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self._run(chunks.aclose())
+
+    def close(self):
+        self._run(self._fetcher.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_fetcher():
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = SyncFetcher()
+            atexit.register(_default_fetcher.close)
+        return _default_fetcher
+
+
+def fetch_url(url, headers=None, html_only=False):
+    return get_fetcher().fetch(url, headers, html_only)
+
+
+def fetch_urls(urls, headers=None, html_only=False):
+    return get_fetcher().fetch_many(urls, headers, html_only)
+
+
+def set_crawl_delay(url, delay):
+    # Every later request to url's site starts at least delay seconds after the previous one
+    get_fetcher().set_crawl_delay(url, delay)
+
+
+def iter_url_content(url, chunk_size=65536):
+    return get_fetcher().iter_content(url, chunk_size)
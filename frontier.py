@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import logging
+import urllib.robotparser
+from typing import NamedTuple
+from urllib.parse import urljoin, urlsplit
+
+from fetcher import fetch_url
+from urlutils import canonicalize_url, is_crawlable_url, site_host, url_key
+
+MAX_CRAWL_DEPTH = 3
+# Longest robots.txt Crawl-delay honored; larger values are clamped to keep audits bounded
+MAX_CRAWL_DELAY = 5.0
+ROBOTS_USER_AGENT = "*"
+
+
+class FrontierEntry(NamedTuple):
+    url: str
+    depth: int
+    # Language announced by hreflang/sitemap annotations, "" when unknown
+    lang_hint: str
+
+
+def url_section(url):
+    # First path segment below any language prefix, e.g. /fr/blog/post -> "blog"
+    segments = [s for s in urlsplit(url).path.split("/") if s]
+    first = segments[0] if segments else ""
+    if (len(first) == 2 and first.isalpha()) or (len(first) == 5 and first[:2].isalpha() and first[2] in "-_"):
+        segments = segments[1:]
+    return segments[0].lower() if segments else ""
+
+
+class RobotsTxt(urllib.robotparser.RobotFileParser):
+    """A parsed robots.txt that keeps its text, for the Sitemap: lines and robots.txt enlargement.
+
+    Crawl-delay is read with float(): RobotFileParser drops values that are not
+    whole numbers, such as "1.5" or "1.0".
+    """
+
+    def __init__(self, text=""):
+        super().__init__()
+        self.text = text
+        # user-agent (lowercase) -> Crawl-delay in seconds
+        self.delays = {}
+        self.parse(text.splitlines())
+        agents, in_rules = [], False
+        for line in text.splitlines():
+            field, _, value = line.split("#", 1)[0].partition(":")
+            field, value = field.strip().lower(), value.strip()
+            if field == "user-agent":
+                if in_rules:
+                    agents, in_rules = [], False
+                agents.append(value.lower())
+            elif field:
+                in_rules = True
+                if field == "crawl-delay":
+                    try:
+                        delay = float(value)
+                    except ValueError:
+                        continue
+                    for agent in agents:
+                        self.delays.setdefault(agent, delay)
+
+    def crawl_delay(self, useragent):
+        name = useragent.split("/")[0].lower()
+        for agent, delay in self.delays.items():
+            if agent != "*" and agent in name:
+                return delay
+        return self.delays.get("*")
+
+
+def load_robots(root_url):
+    # Fetched once per site through the pooled fetcher; a missing or unreachable robots.txt allows everything
+    response = fetch_url(urljoin(root_url + "/", "robots.txt"))
+    if not response.ok:
+        logging.info(f"No usable robots.txt for {root_url} (status {response.status or response.error})")
+        return RobotsTxt()
+    return RobotsTxt(response.text)
+
+
+class CrawlFrontier:
+    """Priority queue of URLs to crawl for one site.
+
+    Shallow URLs come first and, within a depth, sections of the site are
+    interleaved so one large listing cannot crowd out the rest. Seen URLs are
+    kept as 8-byte hashes of their canonical form, and robots.txt rules are
+    applied before anything is queued.
+    """
+
+    def __init__(self, root_url, max_depth=MAX_CRAWL_DEPTH, robots=None):
+        self.root_url = root_url
+        self.host = site_host(root_url)
+        self.max_depth = max_depth
+        self.robots = robots
+        self.skipped = {"seen": 0, "offsite": 0, "not_html": 0, "too_deep": 0, "robots": 0, "invalid": 0}
+        self._seen = set()
+        self._section_counts = {}
+        self._heap = []
+        self._order = itertools.count()
+
+    @property
+    def crawl_delay(self):
+        delay = self.robots.crawl_delay(ROBOTS_USER_AGENT) if self.robots else None
+        return min(float(delay), MAX_CRAWL_DELAY) if delay else 0.0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, href, depth, base_url=None, lang_hint=""):
+        # Canonicalizes and queues href; returns the canonical URL, or None if it was rejected
+        url = canonicalize_url(href, base_url or self.root_url + "/")
+        if url is None:
+            return self.reject("invalid")
+        if depth > self.max_depth:
+            self.skipped["too_deep"] += 1
+            return None
+        if not is_crawlable_url(url):
+            self.skipped["not_html"] += 1
+            return None
+        if site_host(url) != self.host:
+            self.skipped["offsite"] += 1
+            return None
+        key = url_key(url)
+        if key in self._seen:
+            self.skipped["seen"] += 1
+            return None
+        self._seen.add(key)
+        if self.robots is not None and not self.robots.can_fetch(ROBOTS_USER_AGENT, url):
+            self.skipped["robots"] += 1
+            return None
+        section = url_section(url)
+        rank = self._section_counts.get(section, 0)
+        self._section_counts[section] = rank + 1
+        heapq.heappush(self._heap, (depth, rank, next(self._order), FrontierEntry(url, depth, lang_hint)))
+        return url
+
+    def reject(self, reason):
+        # Counts an href turned down before or instead of add(); returns None like a rejected add()
+        self.skipped[reason] += 1
+        return None
+
+    def pop_batch(self, size):
+        batch = []
+        while self._heap and len(batch) < size:
+            batch.append(heapq.heappop(self._heap)[-1])
+        return batch
+
+    def log_stats(self):
+        logging.info(f"Frontier for {self.root_url}: {len(self._seen)} URLs seen, {len(self._heap)} queued, skipped {self.skipped}")
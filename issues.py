@@ -0,0 +1,68 @@
+import heapq
+import itertools
+import re
+
+MAJOR = "major"
+MINOR = "minor"
+SEVERITY_RANK = {MAJOR: 0, MINOR: 1}
+
+SEVERITY_INSTRUCTIONS = (
+    "\n\nEnd every issue with a line \"- Severity: major\" for clear errors (mistranslations, grammar, "
+    "wrong word choice, unnatural expressions) or \"- Severity: minor\" for punctuation, spacing and "
+    "other small issues."
+)
+# Accepts markdown and bracketed grades too: "**Severity:** minor", "- Severity: [minor]"
+SEVERITY_LINE = re.compile(r"^\W*severity\W*?:[\[\*\s]*(\w+).*$\n?", re.IGNORECASE | re.MULTILINE)
+
+
+def issue_severity(issue):
+    # Ungraded issues (custom prompts, findings from older audits) count as major
+    match = SEVERITY_LINE.search(issue)
+    if match and match.group(1).lower() == MINOR:
+        return MINOR
+    return MAJOR
+
+
+def strip_severity(issue):
+    return SEVERITY_LINE.sub("", issue).strip()
+
+
+class IssuePool:
+    """Candidate issues from one audit, ranked by severity and then by discovery order.
+
+    Every page is reviewed once; major issues are selected first and minor ones
+    only fill the remaining slots. Issues quoting an already pooled sentence are
+    dropped.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        # First lines ("- Original sentence: ...") of every pooled issue
+        self.sentences = set()
+        self.counts = {MAJOR: 0, MINOR: 0}
+        self._heap = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, url, lang, issue):
+        if not issue or "Original sentence:" not in issue:
+            return False
+        sentence_line = issue.split("\n")[0]
+        if sentence_line in self.sentences:
+            return False
+        severity = issue_severity(issue)
+        self.sentences.add(sentence_line)
+        self.counts[severity] += 1
+        heapq.heappush(self._heap, (SEVERITY_RANK[severity], next(self._order), url, lang, strip_severity(issue)))
+        return True
+
+    @property
+    def full(self):
+        # Later pages could only add issues ranked below the current selection
+        return self.counts[MAJOR] >= self.limit
+
+    def selected(self):
+        # (url, lang, issue) for the best `limit` issues, severity line removed
+        return [(url, lang, issue) for _, _, url, lang, issue in heapq.nsmallest(self.limit, self._heap)]
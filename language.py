@@ -0,0 +1,76 @@
+import hashlib
+import threading
+
+import langdetect
+from langdetect import DetectorFactory
+
+from metrics import stage
+
+# langdetect is randomized; a fixed seed makes repeated runs agree
+DetectorFactory.seed = 0
+
+# Statistical detection only looks at this many characters from the middle of the page
+LANG_SAMPLE_CHARS = 2000
+LANG_MEMO_SIZE = 10000
+
+# BCP 47 tags mapped onto the codes langdetect (and the UI) use
+CHINESE_VARIANTS = {
+    "zh-hans": "zh-cn", "zh-cn": "zh-cn", "zh-sg": "zh-cn",
+    "zh-hant": "zh-tw", "zh-tw": "zh-tw", "zh-hk": "zh-tw", "zh-mo": "zh-tw",
+}
+LANGUAGE_ALIASES = {"nb": "no", "nn": "no", "iw": "he", "in": "id"}
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def normalize_lang(tag):
+    # "en-US" -> "en", "zh-Hant-TW" -> "zh-tw"; returns "" for missing, multiple or wildcard tags
+    if not tag or "," in tag:
+        return ""
+    tag = tag.strip().lower().replace("_", "-")
+    if not tag or tag in ("x-default", "*", "mul", "und"):
+        return ""
+    subtags = tag.split("-")
+    if subtags[0] == "zh":
+        for subtag in subtags[1:]:
+            variant = CHINESE_VARIANTS.get(f"zh-{subtag}")
+            if variant:
+                return variant
+        return "zh-cn"
+    return LANGUAGE_ALIASES.get(subtags[0], subtags[0])
+
+
+def language_sample(text):
+    # Menus and footers sit at both ends of the page; the middle is the body copy
+    if len(text) <= LANG_SAMPLE_CHARS:
+        return text
+    middle = len(text) // 2
+    return text[middle - LANG_SAMPLE_CHARS // 2:middle + LANG_SAMPLE_CHARS // 2]
+
+
+@stage("detect_lang")
+def detect_text_lang(text):
+    sample = language_sample(text)
+    key = hashlib.sha1(sample.encode("utf-8", errors="replace")).digest()
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+    try:
+        lang = langdetect.detect(sample)
+    except Exception:
+        lang = "unknown"
+    with _memo_lock:
+        if len(_memo) >= LANG_MEMO_SIZE:
+            _memo.clear()
+        _memo[key] = lang
+    return lang
+
+
+def resolve_language(html_lang="", content_language="", text=""):
+    # Declared language wins: <html lang>, then the Content-Language header, then detection
+    for declared in (html_lang, content_language):
+        lang = normalize_lang(declared)
+        if lang:
+            return lang
+    return detect_text_lang(text)
@@ -0,0 +1,225 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import openai
+from openai import OpenAI
+
+import metrics
+
+DEFAULT_MODEL = "gpt-4o"
+# Chat completions kept in flight at once by map_bounded
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+# Account limits enforced client-side; override to match the API key's tier
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_RPM", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TPM", "30000"))
+MAX_RETRIES = 5
+MAX_BACKOFF = 60.0
+# Server and connection failures retried with backoff, as the SDK's own retries would
+# (APITimeoutError is an APIConnectionError); 429s are handled separately
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.InternalServerError, openai.ConflictError)
+TRANSIENT_RETRIES = 2
+# Rough completion size reserved from the token bucket for each request
+COMPLETION_TOKENS_ESTIMATE = 300
+# USD per million (prompt, completion) tokens, used for cost estimates
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+class Cancelled(Exception):
+    """Raised in a map_bounded worker whose results are no longer wanted."""
+
+
+# Set by map_bounded in each worker's context; chat_completion gives up once it is set
+_cancel_event = contextvars.ContextVar("llm_cancel", default=None)
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for Latin-script text; good enough for rate limiting
+    return len(text) // 4 + 1
+
+
+def estimate_cost(prompt_tokens, completion_tokens, model=DEFAULT_MODEL):
+    prompt_price, completion_price = MODEL_PRICES.get(model, MODEL_PRICES[DEFAULT_MODEL])
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class RateLimiter:
+    """Token bucket over requests/minute and tokens/minute, shared by all workers."""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens, cancel=None):
+        # A single request larger than the whole bucket only waits for a full bucket.
+        # With a cancel Event, raises Cancelled instead of waiting on once it is set.
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                else:
+                    delay = max(
+                        (1 - self._requests) * 60 / self.requests_per_minute,
+                        (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                    )
+            if cancel is not None:
+                cancel.wait(max(delay, 0.01))
+            else:
+                time.sleep(max(delay, 0.01))
+
+    def backoff(self, delay):
+        # Pause every worker after a 429
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_default_limiter = None
+
+
+def get_openai_client(api_key):
+    # One client (and connection pool) per API key; retries are handled by chat_completion
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = OpenAI(api_key=api_key, max_retries=0)
+            _clients[api_key] = client
+        return client
+
+
+def get_rate_limiter():
+    global _default_limiter
+    with _clients_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
+
+
+def retry_after(error, attempt):
+    try:
+        return min(float(error.response.headers["retry-after"]), MAX_BACKOFF)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return min(2 ** attempt, MAX_BACKOFF)
+
+
+def record_usage(response, model):
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    metrics.count("llm_requests", model=model)
+    metrics.count("llm_prompt_tokens", prompt_tokens, model=model)
+    metrics.count("llm_completion_tokens", completion_tokens, model=model)
+    metrics.count("llm_cost_usd", estimate_cost(prompt_tokens, completion_tokens, model), model=model)
+
+
+def is_transient(error):
+    return isinstance(error, TRANSIENT_ERRORS) or getattr(error, "status_code", None) == 408
+
+
+def chat_completion(api_key, messages, model=DEFAULT_MODEL, temperature=0.3, limiter=None):
+    client = get_openai_client(api_key)
+    limiter = limiter or get_rate_limiter()
+    tokens = sum(estimate_tokens(m["content"]) for m in messages) + COMPLETION_TOKENS_ESTIMATE
+    cancel = _cancel_event.get()
+    failures = 0
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(tokens, cancel)
+        # The wait may have outlasted the caller's interest
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+        try:
+            response = client.chat.completions.create(model=model, messages=messages, temperature=temperature)
+        except openai.RateLimitError as e:
+            metrics.count("llm_rate_limited")
+            if attempt == MAX_RETRIES:
+                raise
+            metrics.count("llm_retries")
+            delay = retry_after(e, attempt)
+            logging.warning(f"OpenAI rate limit hit, backing off {delay:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})")
+            limiter.backoff(delay)
+            continue
+        except openai.APIError as e:
+            if not is_transient(e):
+                raise
+            metrics.count("llm_errors", error=type(e).__name__)
+            failures += 1
+            if failures > TRANSIENT_RETRIES or attempt == MAX_RETRIES:
+                raise
+            metrics.count("llm_retries")
+            # Only this request waits; other workers are unaffected by one failed call
+            delay = min(0.5 * 2 ** (failures - 1), MAX_BACKOFF)
+            logging.warning(f"OpenAI request failed ({e}), retrying in {delay:.1f}s ({failures}/{TRANSIENT_RETRIES})")
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
+            continue
+        record_usage(response, model)
+        return response
+
+
+def map_bounded(fn, items, concurrency=None):
+    """Yield (item, fn(item)) as calls complete, with at most `concurrency` in flight.
+
+    Items are pulled lazily. Closing the generator (e.g. breaking out of the loop
+    once enough results are in) cancels queued calls and discards in-flight ones.
+    Calls run in a copy of the caller's context, so they record into its metrics scope;
+    chat_completion calls still waiting on the rate limiter when the generator is
+    closed raise Cancelled instead of being sent.
+    """
+    concurrency = concurrency or LLM_CONCURRENCY
+    items = iter(items)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm")
+    cancel = threading.Event()
+    in_flight = {}
+
+    def submit(item):
+        context = contextvars.copy_context()
+        context.run(_cancel_event.set, cancel)
+        return executor.submit(context.run, fn, item)
+
+    try:
+        for item in items:
+            in_flight[submit(item)] = item
+            if len(in_flight) >= concurrency:
+                break
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = in_flight.pop(future)
+                yield item, future.result()
+                for next_item in items:
+                    in_flight[submit(next_item)] = next_item
+                    break
+    finally:
+        cancel.set()
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Set LLM_CACHE_PATH to "" to keep the cache in memory for the current process only
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = 7 * 24 * 3600
+LLM_CACHE_MAX_ENTRIES = 50000
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def llm_cache_key(model, temperature, system_message, prompt_template, text):
+    # The template and text are hashed separately so editing the prompt never matches old answers
+    parts = [model, temperature, sha256(system_message), sha256(prompt_template), sha256(text)]
+    return sha256(json.dumps(parts))
+
+
+class LLMCache:
+    """SQLite-backed store of chat completion results with TTL and LRU size eviction."""
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path or ":memory:"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        if self.path != ":memory:" and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_results_accessed ON llm_results (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT result, created FROM llm_results WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_results SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, result):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_results (key, result, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, result, now, now),
+            )
+            self._conn.execute("DELETE FROM llm_results WHERE created < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM llm_results WHERE key IN ("
+                "SELECT key FROM llm_results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_llm_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = LLMCache()
+            except sqlite3.Error as e:
+                logging.warning(f"Could not open LLM cache at {LLM_CACHE_PATH}: {e}; using an in-memory cache")
+                _default_cache = LLMCache(path="")
+        return _default_cache
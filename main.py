@@ -1,47 +1,125 @@
-import requests
-from bs4 import BeautifulSoup
-import html2text
-import time
+import hashlib
 import os
-import csv
 import random
-import langdetect
-from openai import OpenAI
+import re
 import logging
-import urllib.robotparser
-import urllib.request
-import ssl
 from urllib.parse import urljoin, urlparse
+from fetcher import MAX_CONNECTIONS, fetch_urls, set_crawl_delay
+from page_cache import CachedPage, get_page_cache
+from extract import extract_page
+from language import detect_text_lang, normalize_lang, resolve_language
+from sitemap import discover_sitemap_urls
+from boilerplate import BoilerplateDetector
+from dedup import NearDuplicateIndex, order_by_url_diversity
+from frontier import MAX_CRAWL_DEPTH, CrawlFrontier, load_robots
+from urlutils import canonicalize_url, site_host
+from crawl_state import CrawlState
+from llm import DEFAULT_MODEL, Cancelled, chat_completion, estimate_tokens, map_bounded
+from packing import estimate_review_plan, iter_packs, pack_instructions, pack_text, parse_pack_result
+from issues import MAJOR, MINOR, SEVERITY_INSTRUCTIONS, IssuePool
+from prescreen import PreScreener
+import metrics
+from metrics import stage
+from llm_cache import get_llm_cache, llm_cache_key
  
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
  
-HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-}
+# Number of pages fetched concurrently when walking a list of URLs
+FETCH_BATCH_SIZE = MAX_CONNECTIONS
+# analyze_domain stops reviewing pages once this many issues are collected
+MAX_ISSUES = 7
  
 def detect_lang(text):
-    try:
-        return langdetect.detect(text)
-    except:
-        return "unknown"
+    return detect_text_lang(text)
  
-def get_page_text(url):
+def build_page(url, response):
+    page = CachedPage(
+        url=url,
+        status=response.status,
+        content=response.content,
+        encoding=response.encoding,
+        etag=response.headers.get("ETag", ""),
+        last_modified=response.headers.get("Last-Modified", ""),
+    )
+    if response.ok:
+        try:
+            with stage("extract_page"):
+                extracted = extract_page(response.text)
+            page.text, page.links, page.alternates = extracted.text, extracted.links, extracted.alternates
+            page.lang = resolve_language(extracted.lang, response.headers.get("Content-Language", ""), page.text)
+            page.content_hash = hashlib.sha256(page.text.encode("utf-8")).hexdigest()
+        except Exception as e:
+            logging.error(f"Error parsing {url}: {e}")
+    elif response.status:
+        logging.warning(f"Non-200 status code {response.status} for URL: {url}")
+    return page
+ 
+def get_pages(urls, state=None):
+    # Serve pages from the cache, revalidating stored copies and fetching misses concurrently.
+    # With a CrawlState, pages known from the last audit are revalidated even without a cached copy.
+    cache = get_page_cache()
+    pages = {}
+    stale = {}
+    for url in urls:
+        page = cache.get(url)
+        if page is not None:
+            pages[url] = page
+            continue
+        stored = cache.get_stored(url)
+        if stored is not None:
+            stale[url] = stored
+    to_fetch = [url for url in dict.fromkeys(urls) if url not in pages]
+    if to_fetch:
+        conditional = {url: stale[url].conditional_headers() for url in to_fetch
+                       if url in stale and stale[url].conditional_headers()}
+        if state is not None:
+            for url in to_fetch:
+                if url not in conditional and state.conditional_headers(url):
+                    conditional[url] = state.conditional_headers(url)
+        with stage("fetch_pages"):
+            responses = fetch_urls(to_fetch, headers=conditional, html_only=True)
+        for url, response in zip(to_fetch, responses):
+            if response.status == 304 and url in stale:
+                page = stale[url]
+                cache.mark_revalidated(page)
+            elif response.status == 304 and state is not None and state.stored_page(url):
+                # Not put in the page cache: it has no body for callers that need the text
+                page = state.stored_page(url)
+            elif response.error:
+                page = CachedPage(url=url)
+            elif response.skipped:
+                # Kept in memory so the URL is not downloaded again this run
+                logging.info(f"Skipped {url}: {response.skipped}")
+                page = CachedPage(url=url)
+                cache.put(page)
+            else:
+                page = build_page(url, response)
+                cache.put(page)
+            pages[url] = page
+    if state is not None:
+        for page in pages.values():
+            state.record_page(page)
+    return [pages[url] for url in urls]
+ 
+def get_page(url):
     logging.info(f"Fetching page text for URL: {url}")
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=12)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for tag in soup(["script", "style", "noscript"]):
-                tag.decompose()
-            text = soup.get_text(separator=' ')
-            return html2text.html2text(text)
-        else:
-            logging.warning(f"Non-200 status code {response.status_code} for URL: {url}")
-    except Exception as e:
-        logging.error(f"Error fetching {url}: {e}")
-    return ""
+    return get_pages([url])[0]
  
-def get_all_links(base_url, max_pages=200, allowed_languages=None, tld_mode=False):
+@stage("get_page_text")
+def get_page_text(url):
+    return get_page(url).text
+ 
+def iter_page_batches(urls, batch_size=FETCH_BATCH_SIZE, state=None):
+    # Fetch pages concurrently in batches, yielding lists of (url, page) in input order
+    urls = list(urls)
+    for start in range(0, len(urls), batch_size):
+        batch = urls[start:start + batch_size]
+        logging.info(f"Fetching page text for {len(batch)} URLs")
+        yield list(zip(batch, get_pages(batch, state)))
+ 
+@stage("get_all_links")
+def get_all_links(base_url, max_pages=200, allowed_languages=None, tld_mode=False, use_sitemap=False, robots=None,
+                  max_depth=MAX_CRAWL_DEPTH, state=None):
     logging.info(f"Getting all links from base URL: {base_url}")
     # Use allowed_languages to build language variants
     if allowed_languages and not tld_mode:
@@ -49,92 +127,206 @@ def get_all_links(base_url, max_pages=200, allowed_languages=None, tld_mode=Fals
     else:
         langs = [""]
     logging.info(f"Language variants considered for link crawling: {langs}")
-    pages = set()
-    checked_links = set()
+    pages = []
     parsed = urlparse(base_url)
     root_url = f"{parsed.scheme}://{parsed.netloc}"
+    filter_by_language = allowed_languages is not None and not tld_mode
+    if robots is None:
+        robots = load_robots(root_url)
+    frontier = CrawlFrontier(root_url, max_depth=max_depth, robots=robots)
+    # The fetcher spaces every later request to this site, sitemaps and page batches included;
+    # set even when 0 so a delay from an earlier audit in this process does not linger
+    delay = frontier.crawl_delay
+    set_crawl_delay(root_url, delay)
+    if delay:
+        logging.info(f"Honoring robots.txt crawl-delay of {delay}s for {root_url}")
+
+    def admit(url):
+        if len(pages) < max_pages:
+            pages.append(url)
+
+    def enqueue(href, depth, base=None, lang_hint=""):
+        # hreflang/sitemap annotations decide without fetching; other pages are checked once fetched
+        if lang_hint and filter_by_language and lang_hint not in allowed_languages:
+            return
+        url = canonicalize_url(href, base or root_url + "/")
+        if url is None:
+            frontier.reject("invalid")
+            return
+        # Only add candidate URLs that match allowed language paths (for .com)
+        if allowed_languages and not tld_mode and not lang_hint:
+            path = urlparse(url).path
+            if not (path == "/" or any(path.startswith(f"/{code}") for code in allowed_languages if code)):
+                return
+        if frontier.add(url, depth, lang_hint=lang_hint) and (lang_hint or not filter_by_language):
+            admit(url)
+
     for lang in langs:
-        full_url = urljoin(root_url + "/", lang.lstrip("/"))
-        try:
-            response = requests.get(full_url, headers=HEADERS, timeout=12)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for a_tag in soup.find_all("a", href=True):
-                href = a_tag['href']
-                if any(x in href for x in [".jpg", ".png", ".css", ".js", "#", "tel:", "mailto:"]):
-                    continue
-                candidate_url = None
-                if href.startswith("/"):
-                    candidate_url = urljoin(root_url + "/", href.lstrip("/"))
-                elif href.startswith("http") and root_url in href:
-                    candidate_url = href
-                else:
-                    continue
-                if candidate_url in checked_links:
+        enqueue(urljoin(root_url + "/", lang.lstrip("/")), 0)
+    if use_sitemap:
+        sitemap_languages = allowed_languages if filter_by_language else None
+        for sitemap_url, sitemap_lang in discover_sitemap_urls(root_url, sitemap_languages, max_urls=max_pages * 2,
+                                                               robots_txt=robots.text):
+            enqueue(sitemap_url, 1, lang_hint=sitemap_lang)
+
+    # Fetch level by level until enough pages are admitted; each fetched page feeds the frontier.
+    # With a crawl delay pages come one at a time, so the crawl stops as soon as enough are admitted.
+    while frontier and len(pages) < max_pages:
+        batch = frontier.pop_batch(1 if delay else FETCH_BATCH_SIZE)
+        for entry, page in zip(batch, get_pages([entry.url for entry in batch], state)):
+            if filter_by_language and not entry.lang_hint:
+                if page.lang not in allowed_languages:
                     continue
-                # Only add candidate_url if it matches allowed language paths (for .com)
-                if allowed_languages and not tld_mode:
-                    parsed_candidate = urlparse(candidate_url)
-                    path = parsed_candidate.path
-                    if not (path == "/" or any(path.startswith(f"/{code}") for code in allowed_languages if code)):
-                        continue
-                checked_links.add(candidate_url)
-                # Fetch and check language if filtering is enabled and not tld_mode
-                if allowed_languages is not None and not tld_mode:
-                    page_text = get_page_text(candidate_url)
-                    lang_code = detect_lang(page_text)
-                    if lang_code not in allowed_languages:
-                        continue
-                pages.add(candidate_url)
-                if len(pages) >= max_pages:
-                    break
-            if len(pages) >= max_pages:
-                break
-        except Exception as e:
-            logging.error(f"Error getting links from {full_url}: {e}")
+                admit(entry.url)
+            if entry.depth < max_depth:
+                # hreflang alternates from <head> are candidates too
+                hrefs = page.links + [href for href in page.alternates if href not in page.links]
+                for href in hrefs:
+                    enqueue(href, entry.depth + 1, base=entry.url, lang_hint=normalize_lang(page.alternates.get(href)))
+    frontier.log_stats()
+    for reason, skipped in frontier.skipped.items():
+        metrics.count("crawl_skips", skipped, reason=reason)
     logging.info(f"Found {len(pages)} pages from {base_url} matching allowed_languages={allowed_languages} tld_mode={tld_mode}")
-    return list(pages)[:max_pages]
+    return pages[:max_pages]
+ 
+def iter_reviewable_pages(links, allowed_languages=None, tld_mode=False, boilerplate=None, duplicates=None, state=None):
+    # Yield (url, text, lang) for pages worth sending to the LLM, template text removed.
+    # Near-duplicates of pages already yielded are held back until every distinct page is out.
+    # Pages unchanged since the last reviewed audit come first, with their finding in state.carried.
+    deferred = []
+    for batch in iter_page_batches(links, state=state):
+        reviewable = []
+        for url, page in batch:
+            logging.info(f"Analyzing URL: {url}")
+            if allowed_languages is not None and not tld_mode and page.lang not in allowed_languages:
+                logging.info(f"Skipping URL due to language '{page.lang}' not in allowed_languages: {allowed_languages}")
+                metrics.count("review_skips", reason="language")
+                continue
+            previous = state.previous_issue(url) if state is not None else None
+            if previous is not None:
+                logging.info(f"Unchanged since last audit, reusing its finding: {url}")
+                state.carried[url] = previous
+                metrics.count("review_skips", reason="unchanged")
+                yield url, page.text, page.lang
+                continue
+            reviewable.append((url, page))
+            # The whole batch is counted before any page of it is cleaned
+            if boilerplate is not None:
+                boilerplate.add(url, page.text)
+        for url, page in reviewable:
+            content = page.text
+            if boilerplate is not None:
+                content = boilerplate.clean(url, content)
+                before, after = boilerplate.tokens_by_url[url]
+                logging.info(f"Removed {before - after} boilerplate tokens of {before} from {url}")
+            if not content or len(content) <= 500:
+                logging.info(f"Skipping URL due to insufficient content or empty: {url}")
+                metrics.count("review_skips", reason="thin_content")
+                continue
+            original = duplicates.add(url, content) if duplicates is not None else None
+            if original:
+                logging.info(f"Deferring near-duplicate of {original}: {url}")
+                metrics.count("review_deferred", reason="near_duplicate")
+                deferred.append((url, content, page.lang))
+            else:
+                yield url, content, page.lang
+    if deferred:
+        logging.info(f"Reviewing {len(deferred)} near-duplicate pages last")
+    yield from deferred
  
-def check_linguistic_issues(text, existing_sentences, api_key, allow_minor=False, prompt_template=None):
-    logging.info(f"Checking linguistic issues (allow_minor={allow_minor}) on text of length {len(text)}")
-    if prompt_template is None:
-        prompt_template = (
-            "You are a senior translation QA specialist reviewing website content. Your task is to extract **exactly 1 example** of a linguistic issue from this content. Your focus should be on **clear, verifiable errors** that a native speaker or reviewer would reasonably flag.\n\n"
-            "Only include examples if they fall into these categories:\n"
-            "- Mistranslations\n"
-            "- Grammar issues\n"
-            "- Unnatural expressions\n"
-            "- Incorrect word choice\n\n"
-            "Avoid:\n"
-            "- Issues about punctuation or spacing unless no other issues exist\n"
-            "- Multiple errors from the same sentence, even across different pages\n"
-            "- False positives (acceptable phrasing or domain/product-specific terms)\n\n"
-            "\u26a0\ufe0f You may include punctuation or spacing issues ONLY if no better errors exist in the full input.\n\n"
-            "Response format:\n"
-            "- Original sentence: \"...\"\n"
-            "- Issue: [Short explanation]\n"
-            "- Suggested correction: \"...\"\n\n"
-            "If no issue is found, return an empty string.\n\n"
-            "Text:\n{text}"  # {text} will be replaced below
-        )
-    prompt = prompt_template.format(text=text[:5000])
+DEFAULT_PROMPT_TEMPLATE = (
+    "You are a senior translation QA specialist reviewing website content. Your task is to extract **exactly 1 example** of a linguistic issue from this content. Your focus should be on **clear, verifiable errors** that a native speaker or reviewer would reasonably flag.\n\n"
+    "Only include examples if they fall into these categories:\n"
+    "- Mistranslations\n"
+    "- Grammar issues\n"
+    "- Unnatural expressions\n"
+    "- Incorrect word choice\n\n"
+    "Avoid:\n"
+    "- Issues about punctuation or spacing unless no other issues exist\n"
+    "- Multiple errors from the same sentence, even across different pages\n"
+    "- False positives (acceptable phrasing or domain/product-specific terms)\n\n"
+    "\u26a0\ufe0f You may include punctuation or spacing issues ONLY if no better errors exist in the full input.\n\n"
+    "Grade the issue as major for mistranslations, grammar issues, unnatural expressions and incorrect word choice, "
+    "and as minor for punctuation, spacing and other small issues.\n\n"
+    "Response format:\n"
+    "- Original sentence: \"...\"\n"
+    "- Issue: [Short explanation]\n"
+    "- Suggested correction: \"...\"\n"
+    "- Severity: [major or minor]\n\n"
+    "If no issue is found, return an empty string.\n\n"
+    "Text:\n{text}"
+)
+REVIEW_SYSTEM_MESSAGE = "You are a language quality control expert."
+REVIEW_TEMPERATURE = 0.3
+ 
+@stage("llm_review")
+def review_text(prompt_template, text, api_key):
+    # One chat completion for prompt_template filled with text, through the LLM cache
+    cache = get_llm_cache()
+    cache_key = llm_cache_key(DEFAULT_MODEL, REVIEW_TEMPERATURE, REVIEW_SYSTEM_MESSAGE, prompt_template, text)
+    result = cache.get(cache_key)
+    if result is not None:
+        logging.info("Using cached LLM result")
+        return result
+    response = chat_completion(
+        api_key,
+        [
+            {"role": "system", "content": REVIEW_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt_template.format(text=text)}
+        ],
+        model=DEFAULT_MODEL,
+        temperature=REVIEW_TEMPERATURE
+    )
+    result = response.choices[0].message.content.strip()
+    cache.put(cache_key, result)
+    return result
+ 
+def review_template(prompt_template=None):
+    # Custom templates that do not ask for a severity grade get the grading instructions appended
+    prompt_template = prompt_template or DEFAULT_PROMPT_TEMPLATE
+    if "severity" in prompt_template.lower():
+        return prompt_template
+    return prompt_template + SEVERITY_INSTRUCTIONS
+ 
+def check_linguistic_issues(text, existing_sentences, api_key, prompt_template=None):
+    # The issue found, "" for none, or None if the review itself failed
+    logging.info(f"Checking linguistic issues on text of length {len(text)}")
     try:
-        client = OpenAI(api_key=api_key)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a language quality control expert."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        result = response.choices[0].message.content.strip()
+        result = review_text(review_template(prompt_template), text[:5000], api_key)
         if any(orig in result for orig in existing_sentences):
             return ""
         return result
+    except Cancelled:
+        raise
     except Exception as e:
         logging.error(f"OpenAI API error: {e}")
-        return ""
-
+        return None
+ 
+@stage("check_linguistic_issues")
+def check_linguistic_issues_packed(pack, existing_sentences, api_key, prompt_template=None):
+    # Reviews a pack of Sections in one request; returns (Section, issue) pairs, or None if the review failed
+    if len(pack) == 1:
+        section = pack[0]
+        issue = check_linguistic_issues(section.text, existing_sentences, api_key, prompt_template=prompt_template)
+        if issue is None:
+            return None
+        return [(section, issue)] if issue else []
+    logging.info(f"Checking linguistic issues on {len(pack)} sections "
+                 f"from {len({s.url for s in pack})} pages, {sum(s.tokens for s in pack)} tokens")
+    prompt_template = review_template(prompt_template) + pack_instructions(pack)
+    try:
+        result = review_text(prompt_template, pack_text(pack), api_key)
+    except Cancelled:
+        raise
+    except Exception as e:
+        logging.error(f"OpenAI API error: {e}")
+        return None
+    return [(section, issue) for section, issue in parse_pack_result(result, pack)
+            if not any(orig in issue for orig in existing_sentences)]
+ 
+def hit_stats(hits, misses):
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else 0.0}
+ 
 def estimate_total_pages():
     return 1000
  
@@ -168,8 +360,26 @@ Here are a few examples:
 {outro}"""
     return email
  
-def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_languages=None, use_robots_enlargement=False):
+def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_languages=None, use_robots_enlargement=False, use_sitemap=False, incremental=False, prescreen=False,
+                   metrics_registry=None, metrics_report=None):
+    # Each audit records into its own metrics registry (metrics_registry if given), which is folded into the
+    # process-wide one when it ends and written as JSON to metrics_report or under AUDIT_METRICS_DIR
+    with metrics.scope(metrics_registry) as registry:
+        try:
+            return run_audit(domain, api_key, prompt_template, allowed_languages, use_robots_enlargement, use_sitemap,
+                             incremental, prescreen)
+        finally:
+            name = re.sub(r"[^\w.-]+", "_", domain.replace("https://", "").replace("http://", "").strip("/"))
+            report_path = metrics_report or metrics.report_path(name)
+            if report_path:
+                os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+                registry.write_report(report_path, domain=domain)
+                logging.info(f"Wrote audit metrics to {report_path}")
+
+@stage("analyze_domain")
+def run_audit(domain, api_key, prompt_template, allowed_languages, use_robots_enlargement, use_sitemap, incremental, prescreen):
     logging.info(f"Starting analysis for domain: {domain}")
+    page_stats = get_page_cache().stats()
     base_url = f"https://{domain}" if not domain.startswith("http") else domain
     from urllib.parse import urlparse, urljoin
     parsed = urlparse(base_url)
@@ -179,26 +389,13 @@ def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_lang
     tld = parsed.netloc.split('.')[-1].lower()
     tld_mode = tld != 'com'
 
-    # Try to fetch and parse robots.txt, ignoring SSL verification
-    robots_url = root_url.rstrip("/") + "/robots.txt"
-    logging.info(f"Attempting to fetch robots.txt from: {robots_url}")
-    rp = urllib.robotparser.RobotFileParser()
-    def fetch_robots_txt(url):
-        context = ssl._create_unverified_context()
-        try:
-            with urllib.request.urlopen(url, context=context) as response:
-                logging.info(f"Successfully fetched robots.txt from: {url}")
-                return response.read().decode('utf-8')
-        except Exception as e:
-            logging.warning(f"Could not fetch robots.txt: {e}")
-            return None
-
     base_urls_to_crawl = [root_url]
+    # robots.txt is fetched once; its rules and crawl-delay apply to every crawl of this domain
+    rp = load_robots(root_url)
+    robots_txt = rp.text
     if use_robots_enlargement:
-        robots_txt = fetch_robots_txt(robots_url)
         if robots_txt:
             logging.info(f"Parsing robots.txt for allowed paths.")
-            rp.parse(robots_txt.splitlines())
             allowed_domains = set()
             # Always add the current root domain
             allowed_domains.add(root_url)
@@ -212,7 +409,11 @@ def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_lang
                 ):
                     value = line.split(':', 1)[1].strip()
                     if value.startswith('http://') or value.startswith('https://'):
-                        parsed_url = urlparse(value)
+                        try:
+                            parsed_url = urlparse(value)
+                        except ValueError:
+                            logging.warning(f"Ignoring malformed URL in robots.txt: {value}")
+                            continue
                         domain_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
                         allowed_domains.add(domain_url)
             # Use allowed_languages from the UI instead of hardcoded langs
@@ -251,8 +452,11 @@ def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_lang
             logging.warning("robots.txt not found or could not be fetched. Falling back to default logic.")
             base_urls_to_crawl = [root_url]
 
+    # Incremental re-audits revalidate known pages and reuse findings for unchanged ones
+    state = CrawlState(domain) if incremental else None
+
     # Aggregate links from all allowed base URLs, splitting the limit equally
-    links = set()
+    links = []
     max_total_pages = 200
     num_bases = len(base_urls_to_crawl)
     if num_bases > 0:
@@ -260,62 +464,103 @@ def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_lang
     else:
         per_base_limit = max_total_pages
     for crawl_url in base_urls_to_crawl:
-        new_links = get_all_links(crawl_url, max_pages=per_base_limit, allowed_languages=allowed_languages, tld_mode=tld_mode)
-        links.update(new_links)
-    links = list(links)
-    total_errors = 0
-    collected_issues = []
-    pages_used = 0
-    used_sentences = set()
+        # Other hosts found through robots.txt enlargement load their own robots.txt
+        crawl_robots = rp if site_host(crawl_url) == site_host(root_url) else None
+        new_links = get_all_links(crawl_url, max_pages=per_base_limit, allowed_languages=allowed_languages, tld_mode=tld_mode, use_sitemap=use_sitemap, robots=crawl_robots, state=state)
+        links.extend(new_links)
+    links = list(dict.fromkeys(links))
+    # Distinct URL shapes first, so query-string and pagination variants are fetched last if at all
+    links = order_by_url_diversity(links)
+
+    # Cost estimate from the pages the crawl already fetched, before any template text is removed
+    page_cache = get_page_cache()
+    screener = PreScreener() if prescreen else None
+    sample = [(url, page.text, page.lang) for url, page in ((url, page_cache.peek(url)) for url in links)
+              if page is not None and page.text]
+    if screener is not None:
+        # Scored without growing the spelling vocabulary, which the review pass builds page by page
+        sample = [(url, screener.select(text, lang)[0], lang) for url, text, lang in sample]
+    if sample:
+        plan = estimate_review_plan(sample, total_pages=len(links),
+                                    prompt_tokens=estimate_tokens(review_template(prompt_template) + REVIEW_SYSTEM_MESSAGE))
+        metrics.add_section("review_plan", plan)
+        logging.info(f"Review plan for {domain}: at most {plan['requests']} requests for {plan['pages']} pages "
+                     f"({plan['requests_unpacked']} unpacked), ~{plan['prompt_tokens']} prompt tokens, ~${plan['cost_usd']:.2f}")
+
+    llm_cache = get_llm_cache()
+    boilerplate = BoilerplateDetector()
+    duplicates = NearDuplicateIndex()
+    pool = IssuePool(MAX_ISSUES)
+    cache_hits, cache_misses = llm_cache.hits, llm_cache.misses
+    # url -> [sections reviewed, first finding] for pages whose review is not recorded yet
+    progress = {}
+    failed = set()
 
-    # First pass: look for major issues
-    for url in links:
-        logging.info(f"Analyzing URL: {url}")
-        content = get_page_text(url)
-        lang = detect_lang(content)
-        if allowed_languages is not None and not tld_mode and lang not in allowed_languages:
-            logging.info(f"Skipping URL due to language '{lang}' not in allowed_languages: {allowed_languages}")
+    def is_carried(url):
+        return state is not None and url in state.carried
+
+    def review(pack):
+        if is_carried(pack[0].url):
+            issue = state.carried[pack[0].url]
+            return [(pack[0], issue)] if issue else []
+        # Workers get a snapshot; pool.sentences keeps changing on this thread
+        return check_linguistic_issues_packed(pack, set(pool.sentences), api_key, prompt_template=prompt_template)
+
+    pages = iter_reviewable_pages(links, allowed_languages, tld_mode, boilerplate, duplicates, state)
+    if screener is not None:
+        # Only the sentences with local error signals go to the LLM
+        pages = ((url, text if is_carried(url) else screener.screen(url, text, lang), lang) for url, text, lang in pages)
+    # One pass over the pages; minor issues are pooled and only used if majors run short
+    reviews = map_bounded(review, iter_packs(pages, solo=is_carried))
+    for pack, issues in reviews:
+        if issues is None:
+            # Failed reviews are not recorded, so the next audit reviews these pages again
+            metrics.count("review_failures")
+            failed.update(section.url for section in pack)
             continue
-        if content and len(content) > 500:
-            issue = check_linguistic_issues(content, used_sentences, api_key, prompt_template=prompt_template)
-            if issue and "Original sentence:" in issue:
-                sentence_line = issue.split("\n")[0]
-                if sentence_line not in used_sentences:
-                    formatted = f"{issue}\nURL: {url}\nLanguage: {lang.upper()}"
-                    collected_issues.append(formatted)
-                    used_sentences.add(sentence_line)
-                    total_errors += 1
-                    pages_used += 1
-            if len(collected_issues) >= 7:
-                break
-            time.sleep(1)
-        else:
-            logging.info(f"Skipping URL due to insufficient content or empty: {url}")
+        for section, issue in issues:
+            pool.add(section.url, section.lang, issue)
+        if state is not None and not is_carried(pack[0].url):
+            # A page is recorded once every one of its sections is reviewed, with its first finding
+            found = {}
+            for section, issue in issues:
+                found.setdefault(section.url, issue)
+            for section in pack:
+                reviewed = progress.setdefault(section.url, [0, ""])
+                reviewed[0] += 1
+                reviewed[1] = reviewed[1] or found.get(section.url, "")
+                if reviewed[0] == section.parts and section.url not in failed:
+                    state.record_issue(section.url, reviewed[1])
+        if pool.full:
+            # Cancels queued reviews and discards the ones still in flight
+            reviews.close()
+            break
+    logging.info(f"Issue pool for {domain}: {pool.counts[MAJOR]} major, {pool.counts[MINOR]} minor candidates")
 
-    # Second pass: allow minor issues if not enough found
-    if len(collected_issues) < 7:
-        logging.info("Trying to find minor issues...")
-        for url in links:
-            content = get_page_text(url)
-            lang = detect_lang(content)
-            if allowed_languages is not None and not tld_mode and lang not in allowed_languages:
-                logging.info(f"Skipping URL due to language '{lang}' not in allowed_languages: {allowed_languages}")
-                continue
-            if content and len(content) > 500:
-                issue = check_linguistic_issues(content, used_sentences, api_key, allow_minor=True, prompt_template=prompt_template)
-                if issue and "Original sentence:" in issue:
-                    sentence_line = issue.split("\n")[0]
-                    if sentence_line not in used_sentences:
-                        formatted = f"{issue}\nURL: {url}\nLanguage: {lang.upper()}"
-                        collected_issues.append(formatted)
-                        used_sentences.add(sentence_line)
-                        total_errors += 1
-                        pages_used += 1
-                if len(collected_issues) >= 7:
-                    break
-                time.sleep(1)
-            else:
-                logging.info(f"Skipping URL due to insufficient content or empty: {url}")
+    collected_issues = [f"{issue}\nURL: {url}\nLanguage: {lang.upper()}" for url, lang, issue in pool.selected()]
+    total_errors = pages_used = len(collected_issues)
+
+    boilerplate_stats = boilerplate.stats()
+    logging.info(f"Boilerplate removal for {domain}: {boilerplate_stats['tokens_saved']} of {boilerplate_stats['tokens_before']} tokens saved "
+                 f"({boilerplate_stats['saved_ratio']:.0%}) across {boilerplate_stats['pages_cleaned']} pages")
+    metrics.add_section("boilerplate", boilerplate_stats)
+    if screener is not None:
+        prescreen_stats = screener.stats()
+        logging.info(f"Pre-screening for {domain}: {prescreen_stats['tokens_after']} of {prescreen_stats['tokens_before']} tokens "
+                     f"kept across {prescreen_stats['pages']} pages")
+        metrics.add_section("prescreen", prescreen_stats)
+    if state is not None:
+        logging.info(f"Incremental audit of {domain}: {state.stats()}")
+        metrics.add_section("crawl_state", state.stats())
+        state.close()
+    logging.info(f"LLM cache for {domain}: {llm_cache.hits - cache_hits} hits, {llm_cache.misses - cache_misses} misses")
+    metrics.add_section("llm_cache", hit_stats(llm_cache.hits - cache_hits, llm_cache.misses - cache_misses))
+    page_cache_stats = page_cache.stats()
+    metrics.add_section("page_cache", {
+        **hit_stats(page_cache_stats["hits"] - page_stats["hits"], page_cache_stats["misses"] - page_stats["misses"]),
+        "revalidated": page_cache_stats["revalidated"] - page_stats["revalidated"],
+    })
+    metrics.add_section("issues", {"major": pool.counts[MAJOR], "minor": pool.counts[MINOR], "selected": len(collected_issues)})
 
     if collected_issues:
         examples = "\n\n".join(collected_issues)
@@ -325,8 +570,10 @@ def analyze_domain(domain: str, api_key: str, prompt_template=None, allowed_lang
         email = f"After a review of {domain}, no clear linguistic issues were identified. We'd be happy to run a deeper audit if needed."
         logging.info(f"No issues found for {domain}")
 
+    logging.info(f"Stage timings for {domain}: {metrics.get_metrics().summary()}")
     return email, collected_issues
 
 if __name__ == "__main__":
-    # Entry point intentionally left blank; domain input is now handled via the UI.
-    pass
\ No newline at end of file
+    # Single domains are audited via the UI; the command line runs the headless batch mode.
+    import batch
+    batch.main()
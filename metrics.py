@@ -0,0 +1,273 @@
+"""Per-stage timings and counters for audits, reported as JSON or Prometheus text.
+
+Stages are timed with the stage() context manager (also usable as a decorator);
+counters cover bytes, tokens, cost, retries and skips. Components that already
+keep their own stats() hand them over with add_section().
+
+Each audit records into its own registry inside scope(): module-level stage(),
+count() and add_section() go to the innermost scope of the calling context
+(worker threads started with contextvars.copy_context() inherit it), and the
+scope's totals are folded into the enclosing registry when it exits. Outside any
+scope they go to the process-wide registry returned by get_metrics().
+
+Profiling is opt-in: with PROFILE_DIR set (AUDIT_PROFILE_DIR in the environment),
+the outermost stage running on each thread is run under cProfile and its stats
+are dumped to <PROFILE_DIR>/<stage>-<pid>-<n>.prof. A callable registered with
+set_stage_hook() is called as hook(stage, seconds, error) after every stage,
+e.g. to forward spans to a tracing system.
+"""
+import contextvars
+import cProfile
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+PROMETHEUS_PREFIX = "audit"
+PROFILE_DIR = os.getenv("AUDIT_PROFILE_DIR", "")
+# Directory where every audit writes its own JSON report; off when empty
+REPORT_DIR = os.getenv("AUDIT_METRICS_DIR", "")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, capped by the largest one seen
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "seconds": round(self.total, 4),
+            "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "max": round(self.max, 4),
+            "buckets": self.counts,
+        }
+
+    def merge(self, data):
+        self.counts = [a + b for a, b in zip(self.counts, data["buckets"])]
+        self.count += data["count"]
+        self.total += data["seconds"]
+        self.max = max(self.max, data["max"])
+
+
+class Metrics:
+    """Thread-safe registry of stage histograms, labelled counters and stats sections."""
+
+    def __init__(self):
+        self.stages = {}
+        # (name, ((label, value), ...)) -> number
+        self.counters = {}
+        self.sections = {}
+        self.hook = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profile_ids = itertools.count()
+
+    def reset(self):
+        with self._lock:
+            self.stages, self.counters, self.sections = {}, {}, {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def add_section(self, name, stats):
+        with self._lock:
+            self.sections[name] = dict(stats)
+
+    @contextmanager
+    def stage(self, name):
+        profiler = self._start_profile()
+        error = None
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(name, seconds)
+            if error is not None:
+                self.count("stage_errors", stage=name)
+            if profiler is not None:
+                self._stop_profile(profiler, name)
+            if self.hook is not None:
+                self.hook(name, seconds, error)
+
+    def _start_profile(self):
+        if not PROFILE_DIR or getattr(self._local, "profiling", False):
+            return None
+        self._local.profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, profiler, name):
+        profiler.disable()
+        self._local.profiling = False
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{name}-{os.getpid()}-{next(self._profile_ids)}.prof"))
+
+    def report(self):
+        with self._lock:
+            return {
+                "stages": {name: histogram.to_dict() for name, histogram in sorted(self.stages.items())},
+                "counters": [{"name": name, "labels": dict(labels), "value": round(value, 6)}
+                             for (name, labels), value in sorted(self.counters.items())],
+                "sections": {name: dict(stats) for name, stats in self.sections.items()},
+            }
+
+    def merge(self, report):
+        # Folds another registry's report in; sections keep summed counts, drop ratios and union per-key tables
+        with self._lock:
+            for name, data in report["stages"].items():
+                self.stages.setdefault(name, Histogram()).merge(data)
+            for counter in report["counters"]:
+                key = (counter["name"], tuple(sorted(counter["labels"].items())))
+                self.counters[key] = self.counters.get(key, 0) + counter["value"]
+            for name, stats in report["sections"].items():
+                section = self.sections.setdefault(name, {})
+                for key, value in stats.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool) and "ratio" not in key:
+                        section[key] = section.get(key, 0) + value
+                    elif isinstance(value, dict):
+                        section.setdefault(key, {}).update(value)
+
+    def summary(self):
+        # One line per stage for the logs
+        with self._lock:
+            return ", ".join(f"{name} {h.count}x {h.total:.2f}s (p95 {h.quantile(0.95):.3f}s)"
+                             for name, h in sorted(self.stages.items()))
+
+    def prometheus_text(self, prefix=PROMETHEUS_PREFIX):
+        lines = []
+        with self._lock:
+            if self.stages:
+                lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+            for name, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {histogram.total}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f"{prefix}_{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value}")
+            for name, stats in sorted(self.sections.items()):
+                for key, value in sorted(stats.items()):
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        lines.append(f"# TYPE {prefix}_{name}_{key} gauge")
+                        lines.append(f"{prefix}_{name}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path, **extra):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**extra, **self.report()}, f, indent=2)
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+_default_metrics = Metrics()
+_current = contextvars.ContextVar("metrics", default=None)
+_report_ids = itertools.count()
+
+
+def get_metrics():
+    # Registry of the innermost scope, else the process-wide one
+    return _current.get() or _default_metrics
+
+
+@contextmanager
+def scope(registry=None):
+    parent = get_metrics()
+    registry = registry if registry is not None else Metrics()
+    if registry.hook is None:
+        registry.hook = parent.hook
+    token = _current.set(registry)
+    try:
+        yield registry
+    finally:
+        _current.reset(token)
+        parent.merge(registry.report())
+
+
+@contextmanager
+def stage(name):
+    # Resolves the registry on every entry, so decorated functions record into the caller's scope
+    with get_metrics().stage(name):
+        yield
+
+
+def count(name, value=1, **labels):
+    get_metrics().count(name, value, **labels)
+
+
+def add_section(name, stats):
+    get_metrics().add_section(name, stats)
+
+
+def report_path(name):
+    # <REPORT_DIR>/<name>-<time>-<pid>-<n>.metrics.json, or None when per-audit reports are off
+    if not REPORT_DIR:
+        return None
+    return os.path.join(REPORT_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_report_ids)}.metrics.json")
+
+
+def set_stage_hook(hook):
+    # Scopes opened afterwards inherit the hook
+    _default_metrics.hook = hook
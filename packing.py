@@ -0,0 +1,162 @@
+import logging
+import re
+from typing import NamedTuple
+
+from llm import COMPLETION_TOKENS_ESTIMATE, DEFAULT_MODEL, estimate_cost, estimate_tokens
+
+# Page text sent in one review request, on top of the prompt template
+PACK_TOKEN_BUDGET = 3000
+# Pages longer than this are split into several sections instead of being cut off
+CHUNK_TOKENS = 1200
+
+PACK_INSTRUCTIONS = (
+    "\n\nThe text above is made of {count} sections from different pages, each starting with a "
+    "\"### Section <number>\" header. Apply the instructions to every section on its own and report "
+    "at most one issue per section. Start each issue with a line \"- Section: <number>\" followed by the "
+    "response format. Skip sections without issues."
+)
+SECTION_LINE = re.compile(r"^\W*section\s*:?\s*(\d+)\b.*$", re.IGNORECASE | re.MULTILINE)
+ISSUE_START = re.compile(r"^\W*original sentence\s*:", re.IGNORECASE | re.MULTILINE)
+QUOTED = re.compile(r"[\"“«„](.+?)[\"”»“]")
+
+
+class Section(NamedTuple):
+    url: str
+    lang: str
+    text: str
+    tokens: int
+    # Position of this chunk among the page's sections
+    part: int = 0
+    parts: int = 1
+
+
+def split_into_chunks(text, max_tokens=CHUNK_TOKENS):
+    # Splits on line boundaries; a single line longer than a chunk is split between words
+    chunks, current, current_tokens = [], [], 0
+    pieces = []
+    for line in text.split("\n"):
+        if estimate_tokens(line) <= max_tokens:
+            pieces.append(line)
+            continue
+        part, part_chars = [], 0
+        for word in line.split(" "):
+            # Same ~4 characters per token as estimate_tokens, without re-joining the words
+            if part and part_chars + len(word) > max_tokens * 4:
+                pieces.append(" ".join(part))
+                part, part_chars = [], 0
+            part.append(word)
+            part_chars += len(word) + 1
+        if part:
+            pieces.append(" ".join(part))
+    for piece in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def page_sections(url, text, lang, max_tokens=CHUNK_TOKENS):
+    chunks = split_into_chunks(text, max_tokens)
+    return [Section(url, lang, chunk, estimate_tokens(chunk), i, len(chunks)) for i, chunk in enumerate(chunks)]
+
+
+def iter_packs(pages, budget=PACK_TOKEN_BUDGET, solo=None):
+    """Group (url, text, lang) pages into lists of Sections that fit one request.
+
+    Sections keep the order pages arrive in; a pack is yielded as soon as the next
+    section would overflow the budget. Pages for which solo(url) is true are
+    yielded alone and unsplit, ahead of the pack being filled.
+    """
+    pack, used = [], 0
+    for url, text, lang in pages:
+        if solo is not None and solo(url):
+            yield [Section(url, lang, text, estimate_tokens(text))]
+            continue
+        for section in page_sections(url, text, lang, min(CHUNK_TOKENS, budget)):
+            if pack and used + section.tokens > budget:
+                yield pack
+                pack, used = [], 0
+            pack.append(section)
+            used += section.tokens
+    if pack:
+        yield pack
+
+
+def pack_text(pack):
+    return "\n\n".join(f"### Section {number}\nURL: {section.url}\nLanguage: {section.lang}\n\n{section.text}"
+                       for number, section in enumerate(pack, 1))
+
+
+def pack_instructions(pack):
+    return PACK_INSTRUCTIONS.format(count=len(pack))
+
+
+def section_for_issue(issue, pack):
+    # Fallback when the model dropped the section header: find the quoted sentence
+    match = QUOTED.search(issue.split("\n")[0])
+    if match:
+        for section in pack:
+            if match.group(1).strip() in section.text:
+                return section
+    return None
+
+
+def parse_pack_result(result, pack):
+    """Split a packed review into (Section, issue) pairs.
+
+    Issues keep the single-page response format so callers can treat them like
+    the result of a one-page review.
+    """
+    issues = []
+    markers = list(SECTION_LINE.finditer(result))
+    if markers:
+        for marker, following in zip(markers, markers[1:] + [None]):
+            number = int(marker.group(1))
+            issue = result[marker.end():following.start() if following else len(result)].strip()
+            if not ISSUE_START.search(issue):
+                continue
+            if 1 <= number <= len(pack):
+                issues.append((pack[number - 1], issue))
+            else:
+                logging.warning(f"Review referenced unknown section {number} of {len(pack)}")
+        return issues
+    starts = [m.start() for m in ISSUE_START.finditer(result)]
+    for start, end in zip(starts, starts[1:] + [len(result)]):
+        line_start = result.rfind("\n", 0, start) + 1
+        issue = result[line_start:end].strip()
+        section = section_for_issue(issue, pack)
+        if section is None:
+            logging.warning(f"Could not map review issue back to a page: {issue.splitlines()[0]}")
+            continue
+        issues.append((section, issue))
+    return issues
+
+
+def estimate_review_plan(pages, total_pages=None, budget=PACK_TOKEN_BUDGET, prompt_tokens=0, model=DEFAULT_MODEL):
+    """Requests, tokens and USD for reviewing (url, text, lang) pages in packs.
+
+    prompt_tokens is the per-request overhead (template and system message). With
+    total_pages, the figures for the sampled pages are scaled up to that many.
+    """
+    pages = list(pages)
+    packs = list(iter_packs(pages, budget))
+    requests = len(packs)
+    text_tokens = sum(section.tokens for pack in packs for section in pack)
+    unpacked = sum(len(page_sections(url, text, lang)) for url, text, lang in pages)
+    scale = total_pages / len(pages) if total_pages and pages else 1
+    requests, unpacked = round(requests * scale), round(unpacked * scale)
+    input_tokens = round(text_tokens * scale) + requests * prompt_tokens
+    output_tokens = requests * COMPLETION_TOKENS_ESTIMATE
+    return {
+        "pages": total_pages or len(pages),
+        "requests": requests,
+        "requests_unpacked": unpacked,
+        "prompt_tokens": input_tokens,
+        "completion_tokens": output_tokens,
+        "cost_usd": round(estimate_cost(input_tokens, output_tokens, model), 4),
+    }
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+from urlutils import normalize_url
+
+# Memory tier limits (entries and raw bytes) and default disk tier size
+MAX_MEMORY_ENTRIES = 1024
+MAX_MEMORY_BYTES = 64 * 1024 * 1024
+MAX_DISK_BYTES = 512 * 1024 * 1024
+# Seconds a page in memory is served as is; older copies are revalidated like disk entries
+MAX_MEMORY_AGE = float(os.getenv("PAGE_CACHE_MAX_AGE", "3600"))
+
+
+@dataclass
+class CachedPage:
+    url: str
+    status: int = 0
+    content: bytes = b""
+    encoding: str = "utf-8"
+    text: str = ""
+    links: list = field(default_factory=list)
+    alternates: dict = field(default_factory=dict)
+    lang: str = "unknown"
+    content_hash: str = ""
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def ok(self):
+        return self.status == 200
+
+    @property
+    def html(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def cache_key(url):
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """Two-tier page cache keyed by normalized URL.
+
+    The memory tier is an LRU holding everything seen in this process; get() serves
+    its entries for max_age seconds after they were fetched or revalidated. The
+    optional disk tier keeps successful pages across runs. Expired memory entries
+    and entries read back from disk are stale and should be revalidated with
+    conditional_headers() before reuse.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=MAX_MEMORY_ENTRIES, max_memory_bytes=MAX_MEMORY_BYTES,
+                 max_disk_bytes=MAX_DISK_BYTES, max_age=MAX_MEMORY_AGE):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def get(self, url):
+        key = cache_key(url)
+        with self._lock:
+            page = self._memory.get(key)
+            if page is None or time.time() - page.fetched_at > self.max_age:
+                self.misses += 1
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def peek(self, url):
+        # Memory lookup that leaves LRU order and hit counts alone
+        with self._lock:
+            return self._memory.get(cache_key(url))
+
+    def get_stored(self, url):
+        # Expired memory entry or disk tier lookup; the page may be out of date
+        key = cache_key(url)
+        with self._lock:
+            page = self._memory.get(key)
+        if page is not None:
+            return page
+        if not self.cache_dir:
+            return None
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return CachedPage(content=content, **meta)
+
+    def put(self, page):
+        key = cache_key(page.url)
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old.content)
+            self._memory[key] = page
+            self._memory_bytes += len(page.content)
+            while self._memory and (len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes):
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.content)
+        if self.cache_dir and page.ok:
+            self._store(key, page)
+
+    def mark_revalidated(self, page):
+        self.revalidated += 1
+        page.fetched_at = time.time()
+        self.put(page)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "memory_entries": len(self._memory), "disk_bytes": self._disk_bytes}
+
+    def _paths(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.body")
+
+    def _store(self, key, page):
+        meta_path, body_path = self._paths(key)
+        meta = asdict(page)
+        del meta["content"]
+        try:
+            old_size = sum(os.path.getsize(p) for p in (meta_path, body_path) if os.path.exists(p))
+            with open(body_path, "wb") as f:
+                f.write(page.content)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            new_size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+        except OSError as e:
+            logging.warning(f"Could not write page cache entry for {page.url}: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += new_size - old_size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_entries(self):
+        # (key, size, mtime) for every complete entry on disk
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            meta_path, body_path = self._paths(key)
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+                mtime = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((key, size, mtime))
+        return entries
+
+    def _evict_disk(self):
+        # Drop least recently written entries until the disk tier is 10% under its limit
+        target = self.max_disk_bytes * 0.9
+        for key, size, _ in sorted(self._disk_entries(), key=lambda entry: entry[2]):
+            if self._disk_bytes <= target:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._disk_bytes -= size
+
+
+_default_cache = None
+
+
+def get_page_cache():
+    # Disk tier is enabled by pointing PAGE_CACHE_DIR at a writable directory
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PageCache(cache_dir=os.getenv("PAGE_CACHE_DIR") or None)
+    return _default_cache
@@ -0,0 +1,226 @@
+import logging
+import math
+import re
+import threading
+
+from langdetect import detector_factory
+
+from llm import estimate_tokens
+from metrics import stage
+
+# Page text kept for the LLM: flagged sentences up to PRESCREEN_TOKENS, and when nothing
+# is flagged the longest sentences up to PRESCREEN_SAMPLE_TOKENS
+PRESCREEN_TOKENS = 400
+PRESCREEN_SAMPLE_TOKENS = 120
+# Sentences shorter than this are not checked for being in another language
+MIN_SENTENCE_WORDS = 4
+# A word seen this often on the site is trusted as correctly spelled
+VOCABULARY_MIN_COUNT = 3
+MIN_SPELLING_WORD_LENGTH = 5
+# Languages a sentence is compared against besides the page's own
+CANDIDATE_LANGS = ("en", "fr", "de", "es", "it", "pt", "nl")
+# Mean log-probability per trigram: margin for "another language fits better", and the
+# drop below the page's median for "unusual character sequences"
+FOREIGN_MARGIN = 0.8
+ODD_NGRAM_MARGIN = 1.5
+UNSEEN_NGRAM_PROB = 1e-6
+
+SIGNAL_WEIGHTS = {
+    "placeholder": 3.0,
+    "foreign": 3.0,
+    "spelling": 2.0,
+    "repeated_word": 2.0,
+    "odd_ngrams": 1.5,
+    "spacing": 1.0,
+}
+
+SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+")
+WORD = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+REPEATED_WORD = re.compile(r"\b([^\W\d_]{2,})\s+\1\b", re.IGNORECASE)
+BAD_SPACING = re.compile(r"\w\s+,|\w\s+\.(?!\w)|,,|;;|(?<!\.)\.\.(?!\.)")
+PLACEHOLDER = re.compile(r"\{\{.*?\}\}|%[sd]\b|\blorem ipsum\b|\[object Object\]|\bundefined\b|\bTODO\b|\bNaN\b",
+                         re.IGNORECASE)
+
+_profiles_lock = threading.Lock()
+_profiles_missing = False
+
+
+def ngram_profiles():
+    # langdetect's per-language n-gram probabilities: ({ngram: [p per language]}, [language codes]).
+    # These are langdetect internals; if they move, language signals are skipped rather than failing.
+    try:
+        with _profiles_lock:
+            if detector_factory._factory is None:
+                detector_factory.init_factory()
+        factory = detector_factory._factory
+        return factory.word_lang_prob_map, factory.langlist
+    except AttributeError:
+        global _profiles_missing
+        if not _profiles_missing:
+            logging.warning("langdetect n-gram profiles unavailable; pre-screening without language signals")
+            _profiles_missing = True
+        return {}, []
+
+
+def split_sentences(text):
+    for line in text.split("\n"):
+        for sentence in SENTENCE_END.split(line.strip()):
+            if sentence:
+                yield sentence
+
+
+def trigrams(words):
+    for word in words:
+        padded = f" {word.lower()} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def language_fit(words, langs):
+    # Mean log-probability per trigram of the words under each language's profile
+    profiles, langlist = ngram_profiles()
+    indexes = [langlist.index(lang) for lang in langs]
+    totals = [0.0] * len(indexes)
+    count = 0
+    for gram in trigrams(words):
+        probs = profiles.get(gram)
+        count += 1
+        for i, index in enumerate(indexes):
+            totals[i] += math.log((probs[index] if probs else 0.0) + UNSEEN_NGRAM_PROB)
+    return {lang: total / count for lang, total in zip(langs, totals)} if count else {}
+
+
+def deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+class Vocabulary:
+    """Word counts for one language across a site, with a one-delete index of common words.
+
+    A rare word one edit (or one transposition) away from a common word is a
+    likely misspelling of it.
+    """
+
+    def __init__(self, min_count=VOCABULARY_MIN_COUNT):
+        self.min_count = min_count
+        self.counts = {}
+        self._common = set()
+        self._deletes = set()
+
+    def add(self, words):
+        for word in words:
+            word = word.lower()
+            count = self.counts.get(word, 0) + 1
+            self.counts[word] = count
+            if count == self.min_count and len(word) >= MIN_SPELLING_WORD_LENGTH - 1:
+                self._common.add(word)
+                self._deletes.update(deletes(word))
+
+    def is_near_miss(self, word):
+        word = word.lower()
+        if len(word) < MIN_SPELLING_WORD_LENGTH or self.counts.get(word, 0) >= self.min_count:
+            return False
+        return word in self._deletes or any(d in self._common or d in self._deletes for d in deletes(word))
+
+
+class PreScreener:
+    """Ranks a page's sentences by local error signals and keeps the likeliest for the LLM.
+
+    Feed pages in the order they are reviewed; the spelling vocabulary for each
+    language grows with every page screened on the domain.
+    """
+
+    def __init__(self, budget=PRESCREEN_TOKENS, sample_budget=PRESCREEN_SAMPLE_TOKENS):
+        self.budget = budget
+        self.sample_budget = sample_budget
+        self.pages = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.flagged = {signal: 0 for signal in SIGNAL_WEIGHTS}
+        self._vocabularies = {}
+        self._lock = threading.Lock()
+
+    def score_sentences(self, text, lang):
+        # [(sentence, score, signals)] in document order
+        _, langlist = ngram_profiles()
+        langs = [lang] + [c for c in CANDIDATE_LANGS if c != lang and c in langlist] if lang in langlist else []
+        vocabulary = self._vocabularies.get(lang)
+        sentences = []
+        for sentence in split_sentences(text):
+            words = WORD.findall(sentence)
+            signals = {}
+            if PLACEHOLDER.search(sentence):
+                signals["placeholder"] = 1
+            if REPEATED_WORD.search(sentence):
+                signals["repeated_word"] = 1
+            if BAD_SPACING.search(sentence):
+                signals["spacing"] = 1
+            if vocabulary is not None:
+                misses = sum(vocabulary.is_near_miss(w) for w in words)
+                if misses:
+                    signals["spelling"] = min(misses, 2)
+            fit = language_fit(words, langs) if langs and len(words) >= MIN_SENTENCE_WORDS else {}
+            sentences.append([sentence, signals, fit])
+        own_fits = sorted(fit[lang] for _, _, fit in sentences if fit)
+        median = own_fits[len(own_fits) // 2] if own_fits else 0.0
+        for _, signals, fit in sentences:
+            if not fit:
+                continue
+            best = max(fit, key=fit.get)
+            if best != lang and fit[best] - fit[lang] > FOREIGN_MARGIN:
+                signals["foreign"] = 1
+            elif fit[lang] < median - ODD_NGRAM_MARGIN:
+                signals["odd_ngrams"] = 1
+        return [(sentence, sum(SIGNAL_WEIGHTS[s] * n for s, n in signals.items()), signals)
+                for sentence, signals, _ in sentences]
+
+    def select(self, text, lang):
+        # The passages of text worth an LLM review, in document order
+        if estimate_tokens(text) <= self.sample_budget:
+            return text, {}
+        scored = self.score_sentences(text, lang)
+        ranked = sorted(range(len(scored)), key=lambda i: -scored[i][1])
+        keep, used, budget = set(), 0, self.budget
+        if scored and scored[ranked[0]][1] > 0:
+            ranked = [i for i in ranked if scored[i][1] > 0]
+        else:
+            # Nothing stands out: a small sample of the longest sentences for grammar the signals miss
+            ranked = sorted(range(len(scored)), key=lambda i: -len(scored[i][0]))
+            budget = self.sample_budget
+        flagged = {}
+        for i in ranked:
+            tokens = estimate_tokens(scored[i][0])
+            if used + tokens > budget:
+                if keep:
+                    break
+                continue
+            keep.add(i)
+            used += tokens
+            for signal in scored[i][2]:
+                flagged[signal] = flagged.get(signal, 0) + 1
+        if not keep:
+            # Only sentences longer than the budget; send the start of the page instead
+            return text[:budget * 4], flagged
+        return "\n".join(scored[i][0] for i in sorted(keep)), flagged
+
+    @stage("prescreen")
+    def screen(self, url, text, lang):
+        with self._lock:
+            vocabulary = self._vocabularies.setdefault(lang, Vocabulary())
+            vocabulary.add(WORD.findall(text))
+            selected, flagged = self.select(text, lang)
+            self.pages += 1
+            self.tokens_before += estimate_tokens(text)
+            self.tokens_after += estimate_tokens(selected)
+            for signal, count in flagged.items():
+                self.flagged[signal] += count
+        return selected
+
+    def stats(self):
+        return {
+            "pages": self.pages,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "kept_ratio": round(self.tokens_after / self.tokens_before, 3) if self.tokens_before else 0.0,
+            **{f"flagged_{signal}": count for signal, count in self.flagged.items()},
+        }
@@ -0,0 +1,153 @@
+import logging
+import zlib
+from collections import deque
+from typing import NamedTuple
+from urllib.parse import urljoin
+
+from lxml import etree
+
+from fetcher import fetch_url, iter_url_content
+from language import normalize_lang
+
+# Child sitemaps read from sitemap indexes before giving up
+MAX_SITEMAPS = 25
+GZIP_MAGIC = b"\x1f\x8b"
+# Largest piece of decompressed sitemap handed to the parser at once
+DECOMPRESS_CHUNK_SIZE = 65536
+# The sitemap protocol caps files at 50 MB uncompressed; anything bigger is cut off there
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+
+
+class SitemapEntry(NamedTuple):
+    url: str
+    # Language of url itself from its xhtml:link hreflang annotations, "" if unannotated
+    lang: str
+    # hreflang -> url for every annotated alternate
+    alternates: dict
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def sitemaps_from_robots(robots_txt):
+    return [line.split(":", 1)[1].strip() for line in robots_txt.splitlines()
+            if line.strip().lower().startswith("sitemap:") and line.split(":", 1)[1].strip()]
+
+
+def decompressed(chunks, max_bytes=MAX_SITEMAP_BYTES):
+    # .xml.gz files are served as plain gzip bodies rather than a Content-Encoding.
+    # Output comes in bounded pieces, so a small chunk of a gzip bomb cannot expand all at once.
+    decompressor = None
+    total = 0
+    for chunk in chunks:
+        if decompressor is None:
+            decompressor = zlib.decompressobj(wbits=31) if chunk[:2] == GZIP_MAGIC else False
+        if not decompressor:
+            yield chunk
+            continue
+        while chunk:
+            data = decompressor.decompress(chunk, DECOMPRESS_CHUNK_SIZE)
+            total += len(data)
+            if total > max_bytes:
+                logging.warning(f"Sitemap exceeds {max_bytes} bytes uncompressed; reading stops there")
+                return
+            yield data
+            chunk = decompressor.unconsumed_tail
+    if decompressor:
+        yield decompressor.flush()
+
+
+def parse_sitemap(chunks):
+    """Incrementally parse a sitemap or sitemap index from byte chunks.
+
+    Yields ("url", SitemapEntry) for page entries and ("sitemap", loc) for index
+    entries. Each element is discarded once handled, so memory stays flat however
+    many entries the file holds.
+    """
+    parser = etree.XMLPullParser(events=("end",), tag=("{*}url", "{*}sitemap"), resolve_entities=False,
+                                 no_network=True, huge_tree=True)
+    for chunk in decompressed(chunks):
+        parser.feed(chunk)
+        yield from _drain(parser)
+    parser.close()
+    yield from _drain(parser)
+
+
+def _drain(parser):
+    for _, el in parser.read_events():
+        name = local_name(el.tag)
+        loc = ""
+        alternates = {}
+        for child in el:
+            child_name = local_name(child.tag)
+            if child_name == "loc" and child.text:
+                loc = child.text.strip()
+            elif child_name == "link" and child.get("rel") == "alternate" and child.get("href"):
+                lang = normalize_lang(child.get("hreflang"))
+                if lang:
+                    alternates[lang] = child.get("href").strip()
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+        if not loc:
+            continue
+        if name == "sitemap":
+            yield "sitemap", loc
+        else:
+            lang = next((code for code, href in alternates.items() if href == loc), "")
+            yield "url", SitemapEntry(loc, lang, alternates)
+
+
+def iter_sitemap_entries(sitemap_urls, max_sitemaps=MAX_SITEMAPS):
+    # Walks sitemaps and nested indexes breadth-first, streaming each file
+    queue = deque(sitemap_urls)
+    seen = set()
+    while queue and len(seen) < max_sitemaps:
+        sitemap_url = queue.popleft()
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        logging.info(f"Reading sitemap: {sitemap_url}")
+        chunks = iter_url_content(sitemap_url)
+        try:
+            for kind, value in parse_sitemap(chunks):
+                if kind == "sitemap":
+                    queue.append(value)
+                else:
+                    yield value
+        except Exception as e:
+            logging.warning(f"Could not read sitemap {sitemap_url}: {e}")
+        finally:
+            chunks.close()
+
+
+def discover_sitemap_urls(root_url, allowed_languages=None, max_urls=1000, max_sitemaps=MAX_SITEMAPS, robots_txt=None):
+    """Return up to max_urls (url, lang) pairs listed in the site's sitemaps.
+
+    Sitemaps come from robots.txt (robots_txt if the caller already has it,
+    "" for none), falling back to /sitemap.xml. With allowed_languages, entries
+    whose hreflang annotations put them in another language are dropped;
+    unannotated entries are kept with lang "".
+    """
+    if robots_txt is None:
+        robots = fetch_url(urljoin(root_url + "/", "robots.txt"))
+        robots_txt = robots.text if robots.ok else ""
+    sitemap_urls = sitemaps_from_robots(robots_txt)
+    if not sitemap_urls:
+        sitemap_urls = [urljoin(root_url + "/", "sitemap.xml")]
+    found = {}
+    entries = iter_sitemap_entries(sitemap_urls, max_sitemaps=max_sitemaps)
+    try:
+        for entry in entries:
+            # Annotated alternates are admitted under their own language even if listed elsewhere
+            for url, lang in [(entry.url, entry.lang)] + [(href, code) for code, href in entry.alternates.items()]:
+                if url in found or (allowed_languages and lang and lang not in allowed_languages):
+                    continue
+                found[url] = lang
+                if len(found) >= max_urls:
+                    return list(found.items())
+    finally:
+        entries.close()
+    logging.info(f"Found {len(found)} URLs in sitemaps for {root_url}")
+    return list(found.items())
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from main import analyze_domain
+from metrics import Metrics
 import logging
 
 # Load .env if running locally
@@ -71,10 +72,13 @@ default_prompt = (
     "- Multiple errors from the same sentence, even across different pages\n"
     "- False positives (acceptable phrasing or domain/product-specific terms)\n\n"
     "\u26a0\ufe0f You may include punctuation or spacing issues ONLY if no better errors exist in the full input.\n\n"
+    "Grade the issue as major for mistranslations, grammar issues, unnatural expressions and incorrect word choice, "
+    "and as minor for punctuation, spacing and other small issues.\n\n"
     "Response format:\n"
     "- Original sentence: \"...\"\n"
     "- Issue: [Short explanation]\n"
-    "- Suggested correction: \"...\"\n\n"
+    "- Suggested correction: \"...\"\n"
+    "- Severity: [major or minor]\n\n"
     "If no issue is found, return an empty string.\n\n"
     "Text:\n{text}"
 )
@@ -93,6 +97,24 @@ use_robots_enlargement = st.checkbox(
     help="If enabled, the crawl will include all domains referenced in robots.txt (Sitemap, Allow, Disallow). Default is OFF."
 )
 
+use_sitemap = st.checkbox(
+    "Discover pages from sitemap.xml",
+    value=False,
+    help="If enabled, pages listed in the site's sitemaps (with their hreflang annotations) are added to the crawl before homepage links."
+)
+
+incremental = st.checkbox(
+    "Incremental re-audit",
+    value=False,
+    help="If enabled, pages unchanged since the last audit of this domain reuse their earlier findings instead of being reviewed again."
+)
+
+prescreen = st.checkbox(
+    "Pre-screen pages before review (experimental)",
+    value=False,
+    help="If enabled, only sentences with likely errors (misspellings, untranslated or mixed-language text, doubled words) are sent to the LLM, instead of whole pages. Mistranslations and unnatural phrasing have no local signal and may be missed."
+)
+
 if st.button("Analyze and Generate Email"):
     logging.info("Analyze and Generate Email button clicked.")
     if not url.strip():
@@ -108,14 +130,21 @@ if st.button("Analyze and Generate Email"):
                     logging.error("No OpenAI API key found.")
                 else:
                     logging.info(f"Calling analyze_domain for domain: {domain}")
+                    run_metrics = Metrics()
                     email, issues = analyze_domain(
                         domain,
                         api_key,
                         prompt_template=prompt_template,
                         allowed_languages=allowed_language_codes,
-                        use_robots_enlargement=use_robots_enlargement
+                        use_robots_enlargement=use_robots_enlargement,
+                        use_sitemap=use_sitemap,
+                        incremental=incremental,
+                        prescreen=prescreen,
+                        metrics_registry=run_metrics
                     )
                     st.success("Email generated!")
+                    cache_stats = run_metrics.report()["sections"].get("llm_cache", {})
+                    st.caption(f"LLM cache for this analysis: {cache_stats.get('hits', 0)} hits, {cache_stats.get('misses', 0)} misses")
                     st.subheader("Suggested Email")
                     st.code(email, language=None)
                     if issues:
@@ -0,0 +1,67 @@
+import hashlib
+import posixpath
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Query parameters that only track campaigns or sessions and never change page content
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "dclid", "yclid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "ref_src",
+                   "sessionid", "sid", "phpsessid", "jsessionid", "igshid"}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_", "mtm_")
+# Links to these file types never lead to HTML pages
+NON_HTML_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp", ".tif", ".tiff", ".avif",
+    ".css", ".js", ".mjs", ".map", ".json", ".xml", ".rss", ".atom", ".txt", ".csv",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".rtf",
+    ".zip", ".gz", ".tgz", ".rar", ".7z", ".tar", ".dmg", ".exe", ".msi", ".apk",
+    ".mp3", ".mp4", ".m4a", ".wav", ".ogg", ".webm", ".mov", ".avi", ".woff", ".woff2", ".ttf", ".eot",
+}
+
+
+def normalize_url(url):
+    # Lowercase scheme/host, drop default ports and fragments, use "/" for an empty path
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+
+def canonicalize_url(url, base_url=None):
+    # Absolute, normalized URL with tracking parameters removed and the rest of the query sorted;
+    # None for hrefs that cannot be parsed (bad IPv6 brackets, non-numeric or out-of-range ports)
+    try:
+        if base_url:
+            url = urljoin(base_url, url.strip())
+        parts = urlsplit(normalize_url(url))
+    except ValueError:
+        return None
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)]
+    path = parts.path
+    if "/." in path:
+        path = posixpath.normpath(path) + ("/" if path.endswith("/") else "")
+    return urlunsplit((parts.scheme, parts.netloc, path, urlencode(sorted(query)), ""))
+
+
+def site_host(url):
+    # Host without a leading "www." so both spellings count as one site
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def url_key(url):
+    # Compact dedup key: www./scheme/trailing-slash variants of one canonical URL collide on purpose
+    parts = urlsplit(canonicalize_url(url))
+    port = f":{parts.port}" if parts.port else ""
+    key = f"{site_host(url)}{port}{parts.path.rstrip('/') or '/'}?{parts.query}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+
+def is_crawlable_url(url):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return False
+    extension = posixpath.splitext(parts.path.lower())[1]
+    return extension not in NON_HTML_EXTENSIONS